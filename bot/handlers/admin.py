@@ -14,7 +14,9 @@ from bot.keyboards import (
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardButton
 from database.database import Database
-from services.channel_service import ChannelService
+from services.channel_service import ChannelService, invalidate_channel_access
+from services.broadcast_service import BroadcastService, BROADCAST_TARGETS
+from services.stats_service import stats_service
 from config import ADMIN_IDS
 import string
 import random
@@ -219,6 +221,8 @@ async def add_channel_title(message: Message, state: FSMContext, db: Database):
             channel_username=data['channel_username'],
             title=title
         )
+        # The bot may have been made admin of the channel only just now
+        invalidate_channel_access(data['channel_id'])
         
         await message.answer(
             f"✅ Kanal qo'shildi:\n"
@@ -489,17 +493,18 @@ async def handle_users_list(message: Message, db: Database):
     if not is_admin(message.from_user.id):
         return
     
-    users = await db.get_all_users()
+    users_count = await db.count_users()
     
-    text = f"👥 Jami foydalanuvchilar: {len(users)}\n\n"
+    text = f"👥 Jami foydalanuvchilar: {users_count}\n\n"
     text += "So'nggi 10 ta foydalanuvchi:\n"
     
-    for user in users[-10:]:
+    async for user in db.iter_users(newest_first=True, limit=10):
         username = f"@{user.username}" if user.username else "Username yo'q"
         first_name = user.first_name or "Ism yo'q"
+        created_at = datetime.fromisoformat(str(user.created_at))
         text += f"• {first_name} ({username})\n"
         text += f"  💰 Balans: {user.balance} so'm\n"
-        text += f"  🗓 Qo'shilgan: {user.created_at.strftime('%d.%m.%Y')}\n\n"
+        text += f"  🗓 Qo'shilgan: {created_at.strftime('%d.%m.%Y')}\n\n"
     
     await message.answer(text)
 
@@ -509,7 +514,7 @@ async def handle_statistics(message: Message, db: Database):
     if not is_admin(message.from_user.id):
         return
     
-    stats = await db.get_user_stats()
+    stats = await stats_service.get_stats()
     
     text = (
         f"📈 Bot statistikasi:\n\n"
@@ -528,12 +533,15 @@ async def handle_daily_statistics(message: Message, db: Database):
         return
     
     try:
-        # Get statistics using existing method
-        stats = await db.get_user_stats()
+        stats = await stats_service.get_stats()
+        series = await stats_service.get_daily_series(7)
         today = datetime.now()
+        day_before, yesterday = series[-3], series[-2]
+        orders_by_type = await stats_service.get_orders_by_type(yesterday['day'])
         
-        # Calculate yesterday's users (simple approximation)
-        users_yesterday = max(0, stats['users_week'] - stats['users_today'])
+        def change(key: str) -> str:
+            diff = yesterday[key] - day_before[key]
+            return f"{'+' if diff >= 0 else ''}{diff:,}"
         
         text = (
             f"📈 Kunlik statistika ({today.strftime('%d.%m.%Y')}):\n\n"
@@ -542,7 +550,19 @@ async def handle_daily_statistics(message: Message, db: Database):
             f"📋 Jami buyurtmalar: {stats['total_orders']}\n"
             f"💰 Jami tushum: {stats['total_revenue']:,} so'm\n"
             f"📆 Bu oy buyurtmalar: {stats['orders_month']}\n\n"
-            f"📈 Haftalik o'sish: +{stats['users_week']} foydalanuvchi\n"
+            f"⏮ Kecha (oldingi kunga nisbatan):\n"
+            f"👥 Yangi foydalanuvchilar: {yesterday['users']} ({change('users')})\n"
+            f"📋 Buyurtmalar: {yesterday['orders']} ({change('orders')})\n"
+            f"💰 Tushum: {yesterday['revenue']:,} so'm ({change('revenue')})\n"
+        )
+        for document_type, count in orders_by_type.items():
+            text += f"  • {document_type}: {count}\n"
+        text += f"\n🗓 So'nggi 7 kun (foydalanuvchilar / buyurtmalar / tushum):\n"
+        for day in series:
+            day_label = datetime.fromisoformat(day['day']).strftime('%d.%m')
+            text += f"• {day_label}: +{day['users']} / {day['orders']} / {day['revenue']:,} so'm\n"
+        text += (
+            f"\n📈 Haftalik o'sish: +{stats['users_week']} foydalanuvchi\n"
             f"📅 Ma'lumot: {today.strftime('%d.%m.%Y %H:%M')}"
         )
         
@@ -595,9 +615,10 @@ async def handle_database_management(message: Message, db: Database):
         return
     
     # Get database statistics
-    users_count = len(await db.get_all_users())
-    orders_count = 0  # Placeholder - would need proper query method
-    payments_count = 0  # Placeholder - would need proper query method
+    stats = await stats_service.get_stats()
+    users_count = stats['total_users']
+    orders_count = stats['total_orders']
+    payments_count = stats['total_payments']
     
     text = (
         f"🗄 Database ma'lumotlari:\n\n"
@@ -684,91 +705,23 @@ async def handle_broadcast_message(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_broadcast_target)
 
 @router.callback_query(F.data.startswith("broadcast_"), AdminStates.waiting_for_broadcast_target)
-async def handle_broadcast_target(callback: CallbackQuery, state: FSMContext, db: Database):
-    """Handle broadcast target selection and send messages"""
+async def handle_broadcast_target(callback: CallbackQuery, state: FSMContext, db: Database, broadcast_service: BroadcastService):
+    """Handle broadcast target selection and start sending in the background"""
     if not is_admin(callback.from_user.id):
         return
     
-    target = callback.data.split("_")[1]
+    target = callback.data.split("_")[1]  # all, or active (used the bot in last 30 days)
     data = await state.get_data()
+    await state.clear()
     
-    # Get target users
-    all_users = await db.get_all_users()
-    
-    if target == "all":
-        target_users = all_users
-    else:  # active (users who used the bot in last 30 days)
-        cutoff_date = datetime.now() - timedelta(days=30)
-        target_users = [user for user in all_users if user.updated_at >= cutoff_date]
-    
-    await callback.message.edit_text(
-        f"📢 Reklama yuborilmoqda...\n"
-        f"Jami: {len(target_users)} ta foydalanuvchi"
-    )
+    total = await db.count_users(**BROADCAST_TARGETS.get(target, {}))
+    broadcast_id = await broadcast_service.launch(callback.message.chat.id, target, data)
     
-    # Send advertisements based on type
-    sent_count = 0
-    failed_count = 0
-    message_type = data.get('message_type', 'text')
-    
-    for user in target_users:
-        try:
-            if message_type == "text":
-                await callback.bot.send_message(
-                    user.telegram_id,
-                    data['message_text']
-                )
-            elif message_type == "photo":
-                await callback.bot.send_photo(
-                    user.telegram_id,
-                    photo=data['photo_id'],
-                    caption=data.get('caption')
-                )
-            elif message_type == "video":
-                await callback.bot.send_video(
-                    user.telegram_id,
-                    video=data['video_id'],
-                    caption=data.get('caption')
-                )
-            elif message_type == "document":
-                await callback.bot.send_document(
-                    user.telegram_id,
-                    document=data['document_id'],
-                    caption=data.get('caption')
-                )
-            elif message_type == "animation":
-                await callback.bot.send_animation(
-                    user.telegram_id,
-                    animation=data['animation_id'],
-                    caption=data.get('caption')
-                )
-            elif message_type == "voice":
-                await callback.bot.send_voice(
-                    user.telegram_id,
-                    voice=data['voice_id'],
-                    caption=data.get('caption')
-                )
-            elif message_type == "audio":
-                await callback.bot.send_audio(
-                    user.telegram_id,
-                    audio=data['audio_id'],
-                    caption=data.get('caption')
-                )
-            
-            sent_count += 1
-        except Exception as e:
-            logger.error(f"Failed to send {message_type} to {user.telegram_id}: {e}")
-            failed_count += 1
-    
-    # Send result
     await callback.message.edit_text(
-        f"✅ Reklama yuborish yakunlandi:\n\n"
-        f"📊 Tur: {message_type.title()}\n"
-        f"✅ {sent_count} ta yuborildi\n"
-        f"❌ {failed_count} ta foydalanuvchiga yetmadi"
+        f"📢 Reklama #{broadcast_id} yuborilmoqda...\n"
+        f"Jami: {total} ta foydalanuvchi\n\n"
+        f"Yakunlanganda natija shu yerga yuboriladi."
     )
-    
-    await state.clear()
 
 @router.message(F.text == "👤 Foydalanuvchi rejimi")
 async def switch_to_user_mode(message: Message):
@@ -1,18 +1,26 @@
 import logging
+import copy
 import json
-import asyncio
 import os
-from aiogram import Router, F
+from typing import Tuple
+from aiogram import Bot, Router, F
 from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
 
 from bot.states import DocumentStates
-from bot.keyboards import get_slide_count_keyboard, get_page_count_keyboard, get_main_keyboard, get_template_keyboard
+from bot.keyboards import get_slide_count_keyboard, get_page_count_keyboard, get_main_keyboard, get_template_keyboard, get_regenerate_keyboard
 from database.database import Database
-from services.ai_service_new import AIService
+from database.models import DocumentOrder
+from services.ai_service import AIService as OldAIService
+from services.document_service import DocumentService as OldDocumentService
 from services.document_service_new import DocumentService
 from services.template_service import TemplateService
 from services.channel_service import ChannelService
+from services.render_service import render_document
+from services.job_queue import GenerationQueue, QueueFullError
+from services.progress import job_progress, report_progress
+from services.single_flight import generation_flights, order_requests
+from services.topic_index import normalize_topic
 from translations import get_text
 from config import PRESENTATION_PRICES, DOCUMENT_PRICES
 
@@ -34,6 +42,18 @@ DOCUMENT_TYPES = {
     "📄 Research Paper": "referat"
 }
 
+# Gentle reminder about content review, sent after every document
+REVIEW_REMINDER = """💡 **Muhim eslatma:**
+
+Bu hujjat AI yordamida yaratilgan va sizning yordamchingiz hisoblanadi. 
+
+📝 **Iltimos, matnni diqqat bilan o'qib chiqing va:**
+• Ma'lumotlarning to'g'riligini tekshiring
+• Kerakli o'zgarishlar kiriting  
+• O'z fikr va xulosalaringizni qo'shing
+
+🎯 **Eng yaxshi natija uchun:** Tayyor hujjatni o'z bilim va tajribangiz bilan boyiting!"""
+
 # Dynamic pricing helper function
 def get_document_price(document_type: str, count_data: dict) -> int:
     """Get price based on document type and count"""
@@ -203,126 +223,57 @@ async def handle_template_group_navigation(callback: CallbackQuery, state: FSMCo
         await callback.answer("❌ Xatolik yuz berdi")
 
 @router.callback_query(F.data.startswith("template_template_"))
-async def handle_template_selection(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user):
-    """Handle template selection and start generation"""
+async def handle_template_selection(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user, job_queue: GenerationQueue):
+    """Handle template selection and queue generation"""
     try:
         # Extract template number from callback data (template_template_X)
         template_num = callback.data.split("_")[-1]
         template_id = f"template_{template_num}"
         await callback.answer()
-        
-        # Save selected template
-        await state.update_data(selected_template=template_id)
-        
-        # Clear template selection message
-        # Start presentation generation
-        await callback.message.edit_text("⏳ Taqdimot yaratilmoqda...")
-        await generate_presentation_with_template(callback, state, db, user_lang, user)
-        
-    except Exception as e:
-        logger.error(f"Error in template selection: {e}")
-        await callback.message.answer("❌ Xatolik yuz berdi")
+        # Claimed before reading the state, which the first tap clears
+        if not claim_order_request(callback, user, "presentation"):
+            return
 
-async def generate_presentation_with_template(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user):
-    """Generate presentation with selected template"""
-    try:
         data = await state.get_data()
-        topic = data['topic']
-        slide_count = data['slide_count']
-        template_id = data.get('selected_template', 'template_20')
-        use_free_service = data.get('use_free_service', False)
-
-        # Create order record
-        specifications = json.dumps({
-            "slide_count": slide_count,
-            "template": template_id
-        })
-        order_id = await db.create_document_order(
-            user_id=user.id,
-            document_type="presentation",
-            topic=topic,
-            specifications=specifications
-        )
+        specifications = {
+            "slide_count": data['slide_count'],
+            "template": template_id,
+            "use_free_service": data.get('use_free_service', False)
+        }
+        await enqueue_document_order(callback, state, job_queue, user, user_lang, "presentation", data['topic'], specifications)
 
-        # Generate content with NEW AI BATCH SYSTEM
-        ai_service = AIService()
-        content = await ai_service.generate_presentation_in_batches(topic, slide_count, user_lang)
-
-        # Validate AI response
-        if not content or 'slides' not in content:
-            logger.error(f"Invalid AI response from batch generation: {content}")
-            content = {
-                'slides': [
-                    {'title': topic, 'content': f"Bu taqdimot {topic} mavzusida tayyorlangan.", 'layout_type': 'bullet_points', 'slide_number': 1},
-                    {'title': 'Kirish', 'content': f"{topic} haqida batafsil ma'lumot va asosiy nuqtalar.", 'layout_type': 'bullet_points', 'slide_number': 2}
-                ]
-            }
-
-        # Create presentation with selected template background
-        doc_service = DocumentService()
-        template_service = TemplateService()
-        
-        # Apply template to presentation
-        file_path = await doc_service.create_presentation_with_template_background(
-            topic, content, user.first_name or "", template_id, template_service
-        )
-
-        # Update order
-        await db.update_document_order(order_id, "completed", file_path)
-
-        # Process payment
-        if use_free_service:
-            await db.mark_free_service_used(user.telegram_id)
-            await callback.message.answer(get_text(user_lang, "free_service_used"))
-        else:
-            price = get_document_price("presentation", {"slide_count": slide_count})
-            await db.update_user_balance(user.telegram_id, -price)
-            await callback.message.answer(get_text(user_lang, "document_ready"))
-
-        # Get template name for caption
-        template_service = TemplateService()
-        template_name = template_service.templates.get(template_id, {}).get('name', 'Standart')
-
-        # Send file
-        document = FSInputFile(file_path)
-        await callback.message.answer_document(
-            document=document,
-            caption=get_text(user_lang, "document_ready_caption", 
-                topic=topic,
-                slide_count=slide_count,
-                template=template_name
-            ),
-            reply_markup=get_main_keyboard(user_lang)
-        )
-        
-        # Send gentle reminder about content review
-        reminder_text = """💡 **Muhim eslatma:**
-
-Bu hujjat AI yordamida yaratilgan va sizning yordamchingiz hisoblanadi. 
+    except Exception as e:
+        logger.error(f"Error in template selection: {e}")
+        await callback.message.answer("❌ Xatolik yuz berdi")
 
-📝 **Iltimos, matnni diqqat bilan o'qib chiqing va:**
-• Ma'lumotlarning to'g'riligini tekshiring
-• Kerakli o'zgarishlar kiriting  
-• O'z fikr va xulosalaringizni qo'shing
+def claim_order_request(callback: CallbackQuery, user, document_type: str) -> bool:
+    """False when this order button was already tapped; call before touching the FSM state"""
+    # A double tap delivers the same callback twice before the keyboard is gone
+    if not order_requests.claim((user.id, callback.message.chat.id, callback.message.message_id, callback.data)):
+        logger.info(f"Dropped duplicate {document_type} request from user {user.id}")
+        return False
+    return True
 
-🎯 **Eng yaxshi natija uchun:** Tayyor hujjatni o'z bilim va tajribangiz bilan boyiting!"""
-        
-        await callback.message.answer(reminder_text, parse_mode="Markdown")
+async def enqueue_document_order(callback: CallbackQuery, state: FSMContext, job_queue: GenerationQueue, user, user_lang: str,
+                                 document_type: str, topic: str, specifications: dict):
+    """Put a document order in the generation queue and tell the user their position"""
+    # Everything the worker needs to generate and deliver the document without the FSM state
+    specifications.update({
+        "chat_id": callback.message.chat.id,
+        "status_message_id": callback.message.message_id,
+        "language": user_lang,
+        "author_name": user.first_name or ""
+    })
+    await state.clear()
 
-        await state.clear()
+    try:
+        order_id, position = await job_queue.enqueue(user.id, document_type, topic, specifications)
+    except QueueFullError as e:
+        await callback.message.edit_text(get_text(user_lang, e.reason))
+        await callback.message.answer("Asosiy menyu:", reply_markup=get_main_keyboard(user_lang))
+        return
 
-    except Exception as e:
-        logger.error(f"Error generating presentation with template: {e}")
-        await callback.message.answer(
-            "❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.",
-            reply_markup=get_main_keyboard(user_lang)
-        )
-        try:
-            if 'order_id' in locals():
-                await db.update_document_order(order_id, "failed")
-        except:
-            pass
-        await state.clear()
+    await callback.message.edit_text(get_text(user_lang, "queued", position=position))
 
 @router.callback_query(F.data.startswith("slides_"), DocumentStates.waiting_for_slide_count)
 async def handle_slide_count(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user):
@@ -346,8 +297,12 @@ async def handle_slide_count(callback: CallbackQuery, state: FSMContext, db: Dat
     await state.set_state(DocumentStates.waiting_for_template)
 
 @router.callback_query(F.data.startswith("pages_"), DocumentStates.waiting_for_page_count)
-async def handle_page_count(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user):
+async def handle_page_count(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user, job_queue: GenerationQueue):
     """Handle page count selection"""
+    if not claim_order_request(callback, user, "document"):
+        await callback.answer()
+        return
+
     page_range = callback.data.split("_")[1:]
     min_pages = int(page_range[0])
     max_pages = int(page_range[1])
@@ -364,267 +319,216 @@ async def handle_page_count(callback: CallbackQuery, state: FSMContext, db: Data
         await callback.message.edit_text(get_text(user_lang, "insufficient_balance"))
         return
 
-    await callback.message.edit_text("⏳ " + get_text(user_lang, "generating"))
-
-    # Start document generation
-    if document_type == "independent_work":
-        asyncio.create_task(generate_independent_work(callback, state, db, user_lang, user))
-    else:  # referat
-        asyncio.create_task(generate_referat(callback, state, db, user_lang, user))
+    # Start document generation through the queue
+    specifications = {"min_pages": min_pages, "max_pages": max_pages}
+    await enqueue_document_order(callback, state, job_queue, user, user_lang, document_type, data['topic'], specifications)
 
-async def generate_presentation(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user):
-    """Generate presentation document"""
-    try:
-        data = await state.get_data()
-        topic = data['topic']
-        slide_count = data['slide_count']
-        use_free_service = data.get('use_free_service', False)
-
-        # Create order record
-        specifications = json.dumps({"slide_count": slide_count})
-        order_id = await db.create_document_order(
-            user_id=user.id,
-            document_type="presentation",
-            topic=topic,
-            specifications=specifications
-        )
-
-        # Generate content with NEW AI BATCH SYSTEM
-        ai_service = AIService()
-        content = await ai_service.generate_presentation_in_batches(topic, slide_count, user_lang)
-
-        # Validate AI response
-        if not content or 'slides' not in content:
-            logger.error(f"Invalid AI response from batch generation: {content}")
-            # Create fallback content with new layout system
-            content = {
-                'slides': [
-                    {'title': topic, 'content': f"Bu taqdimot {topic} mavzusida tayyorlangan.", 'layout_type': 'bullet_points', 'slide_number': 1},
-                    {'title': 'Kirish', 'content': f"{topic} haqida batafsil ma'lumot va asosiy nuqtalar.", 'layout_type': 'bullet_points', 'slide_number': 2},
-                    {'title': 'Asosiy qism', 'content': f"{topic}ning asosiy jihatlari va muhim ma'lumotlar.", 'layout_type': 'text_with_image', 'slide_number': 3}
-                ]
-            }
-
-        # Create presentation file with NEW SYSTEM (DALL-E + 3 layouts)
-        doc_service = DocumentService()
-        file_path = await doc_service.create_new_presentation_system(topic, content, user.first_name or "")
-
-        # Update order
-        await db.update_document_order(order_id, "completed", file_path)
-
-        # Process payment
-        data = await state.get_data()
-        use_free_service = data.get('use_free_service', False)
-
-        if use_free_service:
-            await db.mark_free_service_used(user.telegram_id)
-            await callback.message.edit_text(get_text(user_lang, "free_service_used"))
-        else:
-            price = get_document_price("presentation", {"slide_count": slide_count})
-            await db.update_user_balance(user.telegram_id, -price)
-            await callback.message.edit_text(get_text(user_lang, "document_ready"))
-
-        # Send file
-        document = FSInputFile(file_path)
-        await callback.message.answer_document(
-            document=document,
-            caption=f"📊 {topic}",
-            reply_markup=get_main_keyboard(user_lang)
-        )
-        
-        # Send gentle reminder about content review
-        reminder_text = """💡 **Muhim eslatma:**
-
-Bu hujjat AI yordamida yaratilgan va sizning yordamchingiz hisoblanadi. 
+@router.callback_query(F.data.startswith("regenerate_"))
+async def handle_regenerate(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user, job_queue: GenerationQueue):
+    """Queue a fresh generation of an order that was built from cached content"""
+    order = await db.get_document_order(int(callback.data.split("_")[1]))
+    if not order or not user or order.user_id != user.id:
+        await callback.answer("❌ Xatolik yuz berdi")
+        return
 
-📝 **Iltimos, matnni diqqat bilan o'qib chiqing va:**
-• Ma'lumotlarning to'g'riligini tekshiring
-• Kerakli o'zgarishlar kiriting  
-• O'z fikr va xulosalaringizni qo'shing
+    # A fresh run is a new paid order that skips the generation cache
+    specifications = json.loads(order.specifications or "{}")
+    specifications.update({"fresh": True, "use_free_service": False})
+    price = get_document_price(order.document_type, specifications)
+    if user.balance < price:
+        await callback.answer()
+        await callback.message.answer(get_text(user_lang, "insufficient_balance"))
+        return
 
-🎯 **Eng yaxshi natija uchun:** Tayyor hujjatni o'z bilim va tajribangiz bilan boyiting!"""
-        
-        await callback.message.answer(reminder_text, parse_mode="Markdown")
+    await callback.answer()
+    if not claim_order_request(callback, user, order.document_type):
+        return
+    await enqueue_document_order(callback, state, job_queue, user, user_lang, order.document_type, order.topic, specifications)
+
+async def run_document_order(bot: Bot, order: DocumentOrder, *, doc_service: DocumentService,
+                             document_ai_service: OldAIService, sectioned_doc_service: OldDocumentService,
+                             template_service: TemplateService):
+    """Generate, charge and deliver a queued document order (runs in a queue worker)"""
+    specifications = json.loads(order.specifications or "{}")
+    chat_id = specifications.get('chat_id')
+    if not chat_id:
+        raise ValueError(f"Order {order.id} has no chat to deliver to")
+
+    user = await Database.get_user_by_id(order.user_id)
+    if not user:
+        raise ValueError(f"Order {order.id} belongs to an unknown user")
+    user_lang = specifications.get('language') or user.language
 
-    except Exception as e:
-        logger.error(f"Error generating presentation: {e}")
-        await callback.message.edit_text("❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.")
-        await callback.message.answer("Asosiy menyu:", reply_markup=get_main_keyboard(user_lang))
-        # Update order status
-        if 'order_id' in locals():
-            await db.update_document_order(order_id, "failed")
+    # Balance may have changed while the order was waiting in the queue
+    use_free_service = specifications.get('use_free_service', False) and not user.free_service_used
+    price = 0 if use_free_service else get_document_price(order.document_type, specifications)
+    if user.balance < price:
+        await Database.update_document_order(order.id, "failed")
+        await bot.send_message(chat_id, get_text(user_lang, "insufficient_balance"), reply_markup=get_main_keyboard(user_lang))
+        return
 
-    finally:
-        await state.clear()
+    status_message_id = specifications.get('status_message_id')
+    if status_message_id:
+        try:
+            await bot.edit_message_text("⏳ " + get_text(user_lang, "generating"), chat_id=chat_id, message_id=status_message_id)
+        except Exception:
+            pass  # Status message is only cosmetic
 
-async def generate_independent_work(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user):
-    """Generate independent work document"""
     try:
-        data = await state.get_data()
-        topic = data['topic']
-        min_pages = data['min_pages']
-        max_pages = data['max_pages']
-
-        # Create order record
-        specifications = json.dumps({"min_pages": min_pages, "max_pages": max_pages})
-        order_id = await db.create_document_order(
-            user_id=user.id,
-            document_type="independent_work",
-            topic=topic,
-            specifications=specifications
-        )
-
-        # Determine section count based on page range
-        if max_pages <= 15:
-            section_count = 6
-        elif max_pages <= 20:
-            section_count = 9
-        elif max_pages <= 25:
-            section_count = 12
-        else:
-            section_count = 15
-
-        # Generate content with AI using old professional service
-        from services.ai_service import AIService as OldAIService
-        ai_service = OldAIService()
-        content = await ai_service.generate_document_content(
-            topic, section_count, "independent_work", user_lang
-        )
-
-        # Add language info to content for template
-        content['language'] = user_lang
-
-        # Create document file using old professional service
-        from services.document_service import DocumentService as OldDocumentService
-        doc_service = OldDocumentService()
-        file_path = await doc_service.create_independent_work(topic, content)
+        async with job_progress(bot, chat_id, status_message_id, user_lang):
+            if order.document_type == "presentation":
+                file_path, cached, partial = await generate_presentation_with_template(
+                    order.topic, specifications, user_lang, doc_service
+                )
+                template_name = template_service.templates.get(specifications.get('template'), {}).get('name', 'Standart')
+                caption = get_text(user_lang, "document_ready_caption",
+                    topic=order.topic,
+                    slide_count=specifications['slide_count'],
+                    template=template_name
+                )
+                if partial:
+                    caption += "\n\n" + get_text(user_lang, "presentation_partial")
+            else:  # independent_work or referat
+                file_path, cached, partial = await generate_sectioned_document(
+                    order.document_type, order.topic, specifications, user_lang,
+                    document_ai_service, sectioned_doc_service
+                )
+                icon = "🎓" if order.document_type == "independent_work" else "📄"
+                caption = f"{icon} {order.topic}"
+                if partial:
+                    caption += "\n\n" + get_text(user_lang, "document_partial")
 
         # Update order
-        await db.update_document_order(order_id, "completed", file_path)
-
-        # Process payment with dynamic pricing
-        price = get_document_price("independent_work", {"min_pages": min_pages, "max_pages": max_pages})
-        await db.update_user_balance(user.telegram_id, -price)
-        await callback.message.edit_text(get_text(user_lang, "document_ready"))
+        await Database.update_document_order(order.id, "completed", file_path)
+
+        # Process payment; an incomplete document is not charged, so regenerating it costs one full price
+        if partial:
+            await bot.send_message(chat_id, get_text(user_lang, "document_ready"))
+        elif use_free_service:
+            await Database.mark_free_service_used(user.telegram_id)
+            await bot.send_message(chat_id, get_text(user_lang, "free_service_used"))
+        else:
+            await Database.update_user_balance(user.telegram_id, -price)
+            await bot.send_message(chat_id, get_text(user_lang, "document_ready"))
 
         # Send file
-        document = FSInputFile(file_path)
-        await callback.message.answer_document(
-            document=document,
-            caption=f"🎓 {topic}",
+        await bot.send_document(
+            chat_id,
+            document=FSInputFile(file_path),
+            caption=caption,
             reply_markup=get_main_keyboard(user_lang)
         )
-        
-        # Send gentle reminder about content review
-        reminder_text = """💡 **Muhim eslatma:**
 
-Bu hujjat AI yordamida yaratilgan va sizning yordamchingiz hisoblanadi. 
-
-📝 **Iltimos, matnni diqqat bilan o'qib chiqing va:**
-• Ma'lumotlarning to'g'riligini tekshiring
-• Kerakli o'zgarishlar kiriting  
-• O'z fikr va xulosalaringizni qo'shing
-
-🎯 **Eng yaxshi natija uchun:** Tayyor hujjatni o'z bilim va tajribangiz bilan boyiting!"""
-        
-        await callback.message.answer(reminder_text, parse_mode="Markdown")
+        # Send gentle reminder about content review; reused content can be regenerated
+        await bot.send_message(
+            chat_id, REVIEW_REMINDER, parse_mode="Markdown",
+            reply_markup=get_regenerate_keyboard(user_lang, order.id) if cached or partial else None
+        )
 
     except Exception as e:
-        logger.error(f"Error generating independent work: {e}")
-        await callback.message.edit_text(
+        logger.error(f"Error generating {order.document_type} order {order.id}: {e}")
+        await Database.update_document_order(order.id, "failed")
+        await bot.send_message(
+            chat_id,
             "❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.",
             reply_markup=get_main_keyboard(user_lang)
         )
-        if 'order_id' in locals():
-            await db.update_document_order(order_id, "failed")
-
-    finally:
-        await state.clear()
-
-async def generate_referat(callback: CallbackQuery, state: FSMContext, db: Database, user_lang: str, user):
-    """Generate referat document"""
-    try:
-        data = await state.get_data()
-        topic = data['topic']
-        min_pages = data['min_pages']
-        max_pages = data['max_pages']
-
-        # Create order record
-        specifications = json.dumps({"min_pages": min_pages, "max_pages": max_pages})
-        order_id = await db.create_document_order(
-            user_id=user.id,
-            document_type="referat",
-            topic=topic,
-            specifications=specifications
-        )
-
-        # Determine section count based on new page ranges
-        if max_pages <= 15:
-            section_count = 6
-        elif max_pages <= 20:
-            section_count = 9
-        elif max_pages <= 25:
-            section_count = 12
-        else:
-            section_count = 15
 
-        # Generate content with AI using old professional service
-        from services.ai_service import AIService as OldAIService
-        ai_service = OldAIService()
-        content = await ai_service.generate_document_content(
-            topic, section_count, "referat", user_lang
-        )
+async def generate_presentation_with_template(topic: str, specifications: dict, user_lang: str,
+                                              doc_service: DocumentService) -> Tuple[str, bool, bool]:
+    """Generate presentation with selected template.
+
+    Returns (file path, content was cached, some slides are missing).
+    """
+    slide_count = specifications['slide_count']
+    template_id = specifications.get('template', 'template_20')
+
+    # Generate content with NEW AI BATCH SYSTEM, images start as each batch arrives.
+    # Identical requests running at the same time share one generation; rendering
+    # stays per order because author and template differ.
+    fresh = specifications.get('fresh', False)
+    flight_key = ("presentation", normalize_topic(topic), user_lang, slide_count, fresh)
+    # The leader reports its stages to its own status message only
+    if generation_flights.running(flight_key):
+        report_progress("shared")
+    (content, images), shared = await generation_flights.do(
+        flight_key, doc_service.generate_presentation_content_and_images, topic, slide_count, user_lang, fresh=fresh
+    )
+    if shared:
+        report_progress("shared", 1, 1)
+        logger.info(f"Joined in-flight presentation generation for '{topic}'")
+        content, images = copy.deepcopy(content), dict(images)
+
+    # Validate AI response
+    if not content or not content.get('slides'):
+        logger.error(f"Invalid AI response from batch generation: {content}")
+        content = {
+            'partial': True,
+            'slides': [
+                {'title': topic, 'content': f"Bu taqdimot {topic} mavzusida tayyorlangan.", 'layout_type': 'bullet_points', 'slide_number': 1},
+                {'title': 'Kirish', 'content': f"{topic} haqida batafsil ma'lumot va asosiy nuqtalar.", 'layout_type': 'bullet_points', 'slide_number': 2}
+            ]
+        }
+
+    # Render presentation with selected template background off the event loop
+    report_progress("rendering")
+    file_path = await render_document(
+        "template_presentation",
+        topic=topic, content=content, author_name=specifications.get('author_name', ""),
+        template_id=template_id, images=images
+    )
+    return file_path, content.get('cached', False), content.get('partial', False)
+
+def get_section_count(max_pages: int) -> int:
+    """Determine section count based on page range"""
+    if max_pages <= 15:
+        return 6
+    elif max_pages <= 20:
+        return 9
+    elif max_pages <= 25:
+        return 12
+    return 15
+
+async def generate_sectioned_document(document_type: str, topic: str, specifications: dict, user_lang: str,
+                                     ai_service: OldAIService, doc_service: OldDocumentService) -> Tuple[str, bool, bool]:
+    """Generate independent work or referat, writing each section into the document as it arrives.
+
+    Returns (file path, content was cached, some sections are missing).
+    """
+    section_count = get_section_count(specifications['max_pages'])
+    fresh = specifications.get('fresh', False)
+
+    # The file does not depend on who ordered it, so identical concurrent orders share it
+    flight_key = (document_type, normalize_topic(topic), user_lang, section_count, fresh)
+    if generation_flights.running(flight_key):
+        report_progress("shared")
+    (file_path, cached, partial), shared = await generation_flights.do(
+        flight_key, _build_sectioned_document, document_type, topic, section_count, fresh, user_lang, ai_service, doc_service
+    )
+    if shared:
+        logger.info(f"Joined in-flight {document_type} generation for '{topic}'")
+    return file_path, cached, partial
+
+async def _build_sectioned_document(document_type: str, topic: str, section_count: int, fresh: bool, user_lang: str,
+                                    ai_service: OldAIService, doc_service: OldDocumentService) -> Tuple[str, bool, bool]:
+    """Run one sectioned document generation; see generate_sectioned_document"""
+    builder = doc_service.start_sectioned_document(document_type, topic, user_lang)
+
+    # Generate content with AI using old professional service
+    content = await ai_service.generate_document_content(
+        topic, section_count, document_type, user_lang, fresh=fresh,
+        on_outline=builder.start, on_section=builder.add_section
+    )
+    report_progress("rendering")
 
-        # Add language info to content for template
+    if content.get('cached'):
+        # Cached content is complete already; render it in one go off the event loop
         content['language'] = user_lang
+        file_path = await render_document(document_type, topic=topic, content=content)
+        return file_path, True, False
 
-        # Create document file using old professional service  
-        from services.document_service import DocumentService as OldDocumentService
-        doc_service = OldDocumentService()
-        file_path = await doc_service.create_referat(topic, content)
-
-        # Update order
-        await db.update_document_order(order_id, "completed", file_path)
-
-        # Process payment with dynamic pricing
-        price = get_document_price("referat", {"min_pages": min_pages, "max_pages": max_pages})
-        await db.update_user_balance(user.telegram_id, -price)
-        await callback.message.edit_text(get_text(user_lang, "document_ready"))
-
-        # Send file
-        document = FSInputFile(file_path)
-        await callback.message.answer_document(
-            document=document,
-            caption=f"📄 {topic}",
-            reply_markup=get_main_keyboard(user_lang)
-        )
-        
-        # Send gentle reminder about content review
-        reminder_text = """💡 **Muhim eslatma:**
-
-Bu hujjat AI yordamida yaratilgan va sizning yordamchingiz hisoblanadi. 
-
-📝 **Iltimos, matnni diqqat bilan o'qib chiqing va:**
-• Ma'lumotlarning to'g'riligini tekshiring
-• Kerakli o'zgarishlar kiriting  
-• O'z fikr va xulosalaringizni qo'shing
-
-🎯 **Eng yaxshi natija uchun:** Tayyor hujjatni o'z bilim va tajribangiz bilan boyiting!"""
-        
-        await callback.message.answer(reminder_text, parse_mode="Markdown")
-
-    except Exception as e:
-        logger.error(f"Error generating referat: {e}")
-        await callback.message.answer(
-            "❌ Xatolik yuz berdi. Iltimos, qayta urinib ko'ring.",
-            reply_markup=get_main_keyboard(user_lang)
-        )
-        if 'order_id' in locals():
-            await db.update_document_order(order_id, "failed")
-
-    finally:
-        await state.clear()
-
+    file_path = await builder.finish(content.get('references'))
+    return file_path, False, builder.partial
 
 
 @router.message(F.text == "Mening hisobim")
@@ -98,7 +98,8 @@ async def check_subscription(callback: CallbackQuery, db: Database, user_lang: s
     
     if channels:
         channel_service = ChannelService(callback.message.bot)
-        is_subscribed = await channel_service.check_user_subscription(user_id, channels)
+        # The user says they just joined, so skip cached memberships
+        is_subscribed = await channel_service.check_user_subscription(user_id, channels, fresh=True)
         
         if is_subscribed:
             await callback.message.edit_text(
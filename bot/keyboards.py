@@ -187,6 +187,15 @@ def get_subscription_check_keyboard(language: str, channels=None) -> InlineKeybo
     keyboard.adjust(1)  # One button per row
     return keyboard.as_markup()
 
+def get_regenerate_keyboard(language: str, order_id: int) -> InlineKeyboardMarkup:
+    """Offer a fresh generation for a document built from cached content"""
+    keyboard = InlineKeyboardBuilder()
+    keyboard.add(InlineKeyboardButton(
+        text=get_text(language, "regenerate_fresh"),
+        callback_data=f"regenerate_{order_id}"
+    ))
+    return keyboard.as_markup()
+
 def get_admin_keyboard() -> ReplyKeyboardMarkup:
     """Admin panel keyboard - with channel management"""
     keyboard = ReplyKeyboardBuilder()
@@ -27,6 +27,7 @@ class LanguageMiddleware(BaseMiddleware):
         user_id = event.from_user.id
         db = data.get("db", Database)
         
+        # Served from the in-process user cache for hot users
         user = await db.get_user(user_id)
         if user:
             data["user_lang"] = user.language
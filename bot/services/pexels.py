@@ -1,16 +1,20 @@
 import aiohttp
 import asyncio
-import os
 from typing import List, Dict, Optional
 import logging
+from services.image_cache import image_cache
+from services.workspace import workspace_path
+from services.clients import create_http_session, get_http_session, download_to_file
 
 logger = logging.getLogger(__name__)
 
 class PexelsService:
     """Service for working with Pexels API to get images for presentations"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: Optional[aiohttp.ClientSession] = None):
         self.api_key = api_key
+        # None falls back to the application session registered in main.py
+        self.session = session
         self.base_url = "https://api.pexels.com/v1"
         self.headers = {
             "Authorization": api_key
@@ -26,41 +30,46 @@ class PexelsService:
                 "orientation": "landscape"  # Better for presentations
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("photos", [])
-                    else:
-                        logger.error(f"Pexels API error: {response.status}")
-                        return []
+            session = self.session or get_http_session()
+            if session is None:
+                async with create_http_session() as own_session:
+                    return await self._search(own_session, url, params)
+            return await self._search(session, url, params)
         except Exception as e:
             logger.error(f"Error searching images: {e}")
             return []
     
+    async def _search(self, session: aiohttp.ClientSession, url: str, params: Dict) -> List[Dict]:
+        async with session.get(url, headers=self.headers, params=params) as response:
+            if response.status == 200:
+                data = await response.json()
+                return data.get("photos", [])
+            else:
+                logger.error(f"Pexels API error: {response.status}")
+                return []
+
     async def download_image(self, image_url: str, filename: str) -> Optional[str]:
         """Download image and save to file"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status == 200:
-                        content = await response.read()
-                        
-                        # Ensure temp directory exists
-                        os.makedirs("temp", exist_ok=True)
-                        filepath = f"temp/{filename}"
-                        
-                        with open(filepath, "wb") as f:
-                            f.write(content)
-                        
-                        return filepath
-                    else:
-                        logger.error(f"Failed to download image: {response.status}")
-                        return None
-        except Exception as e:
-            logger.error(f"Error downloading image: {e}")
-            return None
+        # Scratch file in the job workspace; the image cache takes it over
+        return await download_to_file(image_url, workspace_path(filename), self.session)
     
+    async def get_cached_image(self, query: str, filename: str, size: str = "medium") -> Optional[str]:
+        """Get the first image for query from the image cache, searching Pexels on a miss"""
+        cache_key = image_cache.make_key("pexels", query)
+        cached_path = await image_cache.get(cache_key)
+        if cached_path:
+            return cached_path
+
+        photos = await self.search_images(query, per_page=1)
+        if not photos:
+            return None
+
+        image_url = self.get_image_url(photos[0], size)
+        image_path = await self.download_image(image_url, filename) if image_url else None
+        if not image_path:
+            return None
+        return await image_cache.put_file(cache_key, image_path)
+
     def get_image_url(self, photo: Dict, size: str = "medium") -> str:
         """Get image URL in specified size"""
         sizes = photo.get("src", {})
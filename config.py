@@ -10,6 +10,23 @@ ADMIN_IDS = list(map(int, filter(None, os.getenv("ADMIN_IDS", "5304482470").spli
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///bot.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+
+# User cache configuration
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+# Channel subscription checks: seconds the bot's access to a channel and a user's membership are cached
+CHANNEL_ACCESS_TTL = int(os.getenv("CHANNEL_ACCESS_TTL", "300"))
+CHANNEL_MEMBERSHIP_TTL = int(os.getenv("CHANNEL_MEMBERSHIP_TTL", "60"))
+
+# Seconds an admin statistics snapshot is reused
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "60"))
+# Daily rollup: seconds between runs and recent days recomputed each run
+STATS_ROLLUP_INTERVAL = int(os.getenv("STATS_ROLLUP_INTERVAL", "600"))
+STATS_ROLLUP_LOOKBACK_DAYS = int(os.getenv("STATS_ROLLUP_LOOKBACK_DAYS", "3"))
 
 # Payment configuration
 PAYMENT_CARD = os.getenv("PAYMENT_CARD", "9860160606136655")
@@ -40,11 +57,68 @@ DOCUMENT_PRICES = {
 # AI configuration
 MAX_TOKENS = 4000
 TEMPERATURE = 0.7
+AI_BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", "4"))
+AI_SECTION_CONCURRENCY = int(os.getenv("AI_SECTION_CONCURRENCY", "4"))
+# Retries of unusable model output (bad JSON, empty text); API errors are retried by the rate limiter
+AI_RETRY_ATTEMPTS = int(os.getenv("AI_RETRY_ATTEMPTS", "3"))
+IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", "4"))
+IMAGE_TIMEOUT = int(os.getenv("IMAGE_TIMEOUT", "90"))
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "1024"))
+
+# Cache of generated slide/section JSON (TTL in seconds, 0 disables)
+GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "2000"))
+# Near-duplicate topic reuse (cosine similarity of character n-grams, 0 disables);
+# the cached topic's words must also all appear in the requested topic
+TOPIC_SIMILARITY_THRESHOLD = float(os.getenv("TOPIC_SIMILARITY_THRESHOLD", "0.5"))
+TOPIC_INDEX_DIM = int(os.getenv("TOPIC_INDEX_DIM", "512"))
+
+# Shared HTTP session for image downloads and Pexels (timeouts in seconds)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+HTTP_KEEPALIVE_TIMEOUT = int(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = int(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_TOTAL_TIMEOUT = int(os.getenv("HTTP_TOTAL_TIMEOUT", "60"))
+
+# Shared OpenAI client (timeout in seconds)
+OPENAI_TIMEOUT = int(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+
+# OpenAI rate limits (per minute) and adaptive concurrency ceilings
+OPENAI_CHAT_RPM = int(os.getenv("OPENAI_CHAT_RPM", "500"))
+OPENAI_CHAT_TPM = int(os.getenv("OPENAI_CHAT_TPM", "30000"))
+OPENAI_IMAGE_RPM = int(os.getenv("OPENAI_IMAGE_RPM", "50"))
+OPENAI_CHAT_MAX_CONCURRENCY = int(os.getenv("OPENAI_CHAT_MAX_CONCURRENCY", "16"))
+OPENAI_IMAGE_MAX_CONCURRENCY = int(os.getenv("OPENAI_IMAGE_MAX_CONCURRENCY", "5"))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "5"))
+
+# Document rendering: "thread" or "process" pool
+RENDER_EXECUTOR = os.getenv("RENDER_EXECUTOR", "thread")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+
+# Generation job queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "3"))
+JOB_PER_USER_CONCURRENCY = int(os.getenv("JOB_PER_USER_CONCURRENCY", "1"))
+JOB_MAX_PENDING_PER_USER = int(os.getenv("JOB_MAX_PENDING_PER_USER", "2"))
+JOB_QUEUE_MAX_PENDING = int(os.getenv("JOB_QUEUE_MAX_PENDING", "200"))
+# Seconds during which a repeated tap on the same order button is ignored
+ORDER_DEDUP_SECONDS = int(os.getenv("ORDER_DEDUP_SECONDS", "30"))
+
+# Broadcasts: messages per second (Telegram allows about 30), parallel sends, recipients per checkpoint
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "200"))
+
+# Minimum seconds between status message edits while a job is running
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "3"))
 
 # File paths
 DOCUMENTS_DIR = "generated_documents"
 TEMP_DIR = "temp"
+IMAGE_CACHE_DIR = "cache/images"
 
 # Ensure directories exist
 os.makedirs(DOCUMENTS_DIR, exist_ok=True)
 os.makedirs(TEMP_DIR, exist_ok=True)
+os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Optional
+from .models import User
+
+class UserCache:
+    """Bounded LRU cache of User objects with per-entry TTL"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # Bumped on every invalidation so reads that raced a write are not cached
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, telegram_id: int) -> Optional[User]:
+        """Get a copy of the cached user, or None on miss/expiry"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[telegram_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(telegram_id)
+        self.hits += 1
+        # Handlers sometimes mutate the user they get, so never share the cached instance
+        return replace(user)
+
+    def set(self, user: User, generation: Optional[int] = None):
+        """Cache user, evicting the least recently used entry when full"""
+        if self.max_size <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[user.telegram_id] = (replace(user), time.monotonic() + self.ttl)
+        self._entries.move_to_end(user.telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, telegram_id: int):
+        """Drop cached user"""
+        self.generation += 1
+        self._entries.pop(telegram_id, None)
+
+    def clear(self):
+        """Drop all cached users"""
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get cache hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -1,15 +1,125 @@
 import aiosqlite
 import asyncio
-from datetime import datetime
-from typing import List, Optional, Dict
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Dict
 from .models import User, Payment, Channel, Promocode, UsedPromocode, DocumentOrder, BroadcastMessage
-from config import DATABASE_URL
+from .pool import ConnectionPool
+from .cache import UserCache
+from config import DATABASE_URL, DB_POOL_SIZE, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, USER_CACHE_SIZE, USER_CACHE_TTL
 
 DATABASE_FILE = "bot.db"
 
+# PRAGMAs applied to every pooled connection
+CONNECTION_PRAGMAS = {
+    "busy_timeout": 5000,
+    "synchronous": "NORMAL",
+    "cache_size": -DB_CACHE_SIZE_KB,
+    "mmap_size": DB_MMAP_SIZE,
+    "temp_store": "MEMORY"
+}
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    # 1: Secondary indexes matching the hot queries
+    [
+        "CREATE INDEX IF NOT EXISTS idx_payments_status_created ON payments (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_document_orders_user_created ON document_orders (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_document_orders_created ON document_orders (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_used_promocodes_user_promocode ON used_promocodes (user_id, promocode_id)",
+        "CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_users_updated ON users (updated_at)",
+    ],
+    # 2: Generation job queue lookups on document_orders
+    [
+        "CREATE INDEX IF NOT EXISTS idx_document_orders_status_user ON document_orders (status, user_id)",
+    ],
+    # 3: Cache of generated slide/section JSON
+    [
+        """CREATE TABLE IF NOT EXISTS generation_cache (
+            cache_key TEXT PRIMARY KEY,
+            document_type TEXT NOT NULL,
+            language TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            hits INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_generation_cache_last_used ON generation_cache (last_used_at)",
+    ],
+    # 4: Original topic and size of cached generations for similarity lookups
+    [
+        "ALTER TABLE generation_cache ADD COLUMN topic TEXT",
+        "ALTER TABLE generation_cache ADD COLUMN size INTEGER",
+    ],
+    # 5: Resumable broadcasts - message payload, delivery cursor over users.id and state
+    [
+        "ALTER TABLE broadcast_messages ADD COLUMN payload TEXT",
+        "ALTER TABLE broadcast_messages ADD COLUMN admin_chat_id INTEGER",
+        "ALTER TABLE broadcast_messages ADD COLUMN last_user_id INTEGER DEFAULT 0",
+        "ALTER TABLE broadcast_messages ADD COLUMN status TEXT DEFAULT 'completed'",
+        "CREATE INDEX IF NOT EXISTS idx_broadcast_messages_status ON broadcast_messages (status)",
+    ],
+    # 6: Daily rollup of signups, orders and approved payments
+    [
+        """CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT NOT NULL,
+            document_type TEXT NOT NULL DEFAULT '',
+            language TEXT NOT NULL DEFAULT '',
+            new_users INTEGER DEFAULT 0,
+            orders INTEGER DEFAULT 0,
+            completed_orders INTEGER DEFAULT 0,
+            payments INTEGER DEFAULT 0,
+            revenue INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (day, document_type, language)
+        )""",
+    ],
+]
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ConnectionPool] = None
+
+# Users looked up by telegram_id on every update (see LanguageMiddleware)
+user_cache = UserCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Required channels, read on every /start and document request; reset by add/remove_channel
+_active_channels: Optional[List[Channel]] = None
+_channels_generation = 0
+
+@asynccontextmanager
+async def _connection():
+    """Borrow a pooled connection, or open a one-off one before init_db()"""
+    if _pool is not None:
+        async with _pool.acquire() as db:
+            yield db
+    else:
+        async with aiosqlite.connect(DATABASE_FILE) as db:
+            db.row_factory = aiosqlite.Row
+            yield db
+
+def _invalidate_active_channels():
+    global _active_channels, _channels_generation
+    _active_channels = None
+    _channels_generation += 1
+
+def get_pool_stats() -> dict:
+    """Get database pool metrics"""
+    return _pool.stats() if _pool else {}
+
+def get_user_cache_stats() -> dict:
+    """Get user cache hit/miss counters"""
+    return user_cache.stats()
+
 async def init_db():
     """Initialize database with tables"""
     async with aiosqlite.connect(DATABASE_FILE) as db:
+        # WAL lets readers proceed while a writer is active (persistent setting)
+        await db.execute("PRAGMA journal_mode = WAL")
+
         # Users table
         await db.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -108,25 +218,59 @@ async def init_db():
 
         await db.commit()
 
+        await _apply_migrations(db)
+
+    # Open the shared connection pool
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(DATABASE_FILE, size=DB_POOL_SIZE, pragmas=CONNECTION_PRAGMAS)
+        await _pool.open()
+
+async def _apply_migrations(db):
+    """Apply pending schema migrations"""
+    async with db.execute("PRAGMA user_version") as cursor:
+        version = (await cursor.fetchone())[0]
+
+    for target, statements in enumerate(SCHEMA_MIGRATIONS, 1):
+        if version >= target:
+            continue
+        for statement in statements:
+            await db.execute(statement)
+        await db.execute(f"PRAGMA user_version = {target}")
+        await db.commit()
+        logger.info(f"Database schema migrated to version {target}")
+
+async def close_db():
+    """Close the shared connection pool"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
 class Database:
     @staticmethod
     async def get_user(telegram_id: int) -> Optional[User]:
         """Get user by telegram ID"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        user = user_cache.get(telegram_id)
+        if user:
+            return user
+
+        generation = user_cache.generation
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM users WHERE telegram_id = ?", (telegram_id,)
             ) as cursor:
                 row = await cursor.fetchone()
                 if row:
-                    return User(**dict(row))
+                    user = User(**dict(row))
+                    user_cache.set(user, generation)
+                    return user
                 return None
 
     @staticmethod
     async def get_user_by_id(user_id: int) -> Optional[User]:
         """Get user by internal ID"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM users WHERE id = ?", (user_id,)
             ) as cursor:
@@ -138,59 +282,64 @@ class Database:
     @staticmethod
     async def create_user(telegram_id: int, username: str = None, first_name: str = None, language: str = 'en') -> User:
         """Create new user"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 """INSERT INTO users (telegram_id, username, first_name, language) 
                    VALUES (?, ?, ?, ?)""",
                 (telegram_id, username, first_name, language)
             )
             await db.commit()
-            return await Database.get_user(telegram_id)
+        user_cache.invalidate(telegram_id)
+        return await Database.get_user(telegram_id)
 
     @staticmethod
     async def update_user_language(telegram_id: int, language: str):
         """Update user language"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE users SET language = ?, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = ?",
                 (language, telegram_id)
             )
             await db.commit()
+        user_cache.invalidate(telegram_id)
 
     @staticmethod
     async def update_user_balance(telegram_id: int, amount: int):
         """Update user balance"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE users SET balance = balance + ?, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = ?",
                 (amount, telegram_id)
             )
             await db.commit()
+        user_cache.invalidate(telegram_id)
 
     @staticmethod
     async def mark_free_service_used(telegram_id: int):
         """Mark that user has used free service"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE users SET free_service_used = TRUE, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = ?",
                 (telegram_id,)
             )
             await db.commit()
+        user_cache.invalidate(telegram_id)
 
     @staticmethod
     async def reset_free_service(telegram_id: int):
         """Reset free service (from promocode)"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE users SET free_service_used = FALSE, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = ?",
                 (telegram_id,)
             )
             await db.commit()
+        user_cache.invalidate(telegram_id)
 
     @staticmethod
     async def create_payment(user_id: int, amount: int, screenshot_file_id: str) -> int:
         """Create payment record"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             cursor = await db.execute(
                 "INSERT INTO payments (user_id, amount, screenshot_file_id) VALUES (?, ?, ?)",
                 (user_id, amount, screenshot_file_id)
@@ -201,8 +350,7 @@ class Database:
     @staticmethod
     async def get_payment_by_id(payment_id: int) -> Optional[Payment]:
         """Get payment by ID"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM payments WHERE id = ?", (payment_id,)
             ) as cursor:
@@ -214,8 +362,7 @@ class Database:
     @staticmethod
     async def get_pending_payments() -> List[Payment]:
         """Get all pending payments"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM payments WHERE status = 'pending' ORDER BY created_at"
             ) as cursor:
@@ -225,7 +372,7 @@ class Database:
     @staticmethod
     async def update_payment_status(payment_id: int, status: str):
         """Update payment status"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE payments SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
                 (status, payment_id)
@@ -235,39 +382,48 @@ class Database:
     @staticmethod
     async def get_active_channels() -> List[Channel]:
         """Get all active channels"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        global _active_channels
+        if _active_channels is not None:
+            return list(_active_channels)
+
+        generation = _channels_generation
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM channels WHERE is_active = TRUE"
             ) as cursor:
                 rows = await cursor.fetchall()
-                return [Channel(**dict(row)) for row in rows]
+                channels = [Channel(**dict(row)) for row in rows]
+        # A channel added or removed during the read leaves the cache empty
+        if generation == _channels_generation:
+            _active_channels = channels
+        return list(channels)
 
     @staticmethod
     async def add_channel(channel_id: str, channel_username: str, title: str):
         """Add new channel"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "INSERT OR REPLACE INTO channels (channel_id, channel_username, title) VALUES (?, ?, ?)",
                 (channel_id, channel_username, title)
             )
             await db.commit()
+        _invalidate_active_channels()
 
     @staticmethod
     async def remove_channel(channel_id: str):
         """Remove channel"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE channels SET is_active = FALSE WHERE channel_id = ?",
                 (channel_id,)
             )
             await db.commit()
+        _invalidate_active_channels()
 
     @staticmethod
     async def get_channel_by_id(channel_id: str) -> Optional[Channel]:
         """Get channel by ID"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM channels WHERE channel_id = ?", (channel_id,)
             ) as cursor:
@@ -279,7 +435,7 @@ class Database:
     @staticmethod
     async def create_promocode(code: str, expires_at: datetime) -> int:
         """Create promocode"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             cursor = await db.execute(
                 "INSERT INTO promocodes (code, expires_at) VALUES (?, ?)",
                 (code, expires_at)
@@ -290,8 +446,7 @@ class Database:
     @staticmethod
     async def get_promocode(code: str) -> Optional[Promocode]:
         """Get promocode by code"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM promocodes WHERE code = ? AND is_active = TRUE",
                 (code,)
@@ -304,8 +459,7 @@ class Database:
     @staticmethod
     async def get_promocode_by_id(promocode_id: int) -> Optional[Promocode]:
         """Get promocode by ID"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM promocodes WHERE id = ?", (promocode_id,)
             ) as cursor:
@@ -317,7 +471,7 @@ class Database:
     @staticmethod
     async def is_promocode_used(user_id: int, promocode_id: int) -> bool:
         """Check if user has used this promocode"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             async with db.execute(
                 "SELECT COUNT(*) FROM used_promocodes WHERE user_id = ? AND promocode_id = ?",
                 (user_id, promocode_id)
@@ -328,7 +482,7 @@ class Database:
     @staticmethod
     async def mark_promocode_used(user_id: int, promocode_id: int):
         """Mark promocode as used by user"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "INSERT INTO used_promocodes (user_id, promocode_id) VALUES (?, ?)",
                 (user_id, promocode_id)
@@ -338,7 +492,7 @@ class Database:
     @staticmethod
     async def deactivate_promocode(promocode_id: int):
         """Deactivate promocode"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE promocodes SET is_active = FALSE WHERE id = ?",
                 (promocode_id,)
@@ -348,7 +502,7 @@ class Database:
     @staticmethod
     async def deactivate_promocode_by_code(code: str) -> bool:
         """Deactivate promocode by code, returns True if found and deactivated"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             async with db.execute(
                 "UPDATE promocodes SET is_active = FALSE WHERE code = ? AND is_active = TRUE",
                 (code.upper(),)
@@ -359,8 +513,7 @@ class Database:
     @staticmethod
     async def get_active_promocodes() -> List[Promocode]:
         """Get all active promocodes"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM promocodes WHERE is_active = TRUE ORDER BY created_at DESC"
             ) as cursor:
@@ -370,7 +523,7 @@ class Database:
     @staticmethod
     async def count_promocode_usage(promocode_id: int) -> int:
         """Count how many times a promocode has been used"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             async with db.execute(
                 "SELECT COUNT(*) FROM used_promocodes WHERE promocode_id = ?",
                 (promocode_id,)
@@ -381,8 +534,7 @@ class Database:
     @staticmethod
     async def get_all_promocodes_with_stats() -> List[Dict]:
         """Get all promocodes with usage statistics"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute("""
                 SELECT 
                     p.*,
@@ -399,21 +551,79 @@ class Database:
                 return [dict(row) for row in rows]
 
     @staticmethod
-    async def create_document_order(user_id: int, document_type: str, topic: str, specifications: str) -> int:
+    async def create_document_order(user_id: int, document_type: str, topic: str, specifications: str, status: str = 'generating') -> int:
         """Create document order"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             cursor = await db.execute(
-                "INSERT INTO document_orders (user_id, document_type, topic, specifications) VALUES (?, ?, ?, ?)",
-                (user_id, document_type, topic, specifications)
+                "INSERT INTO document_orders (user_id, document_type, topic, specifications, status) VALUES (?, ?, ?, ?, ?)",
+                (user_id, document_type, topic, specifications, status)
             )
             await db.commit()
             return cursor.lastrowid
 
+    @staticmethod
+    async def claim_next_document_order(per_user_limit: int) -> Optional[DocumentOrder]:
+        """Mark the oldest queued order as generating and return it.
+
+        Orders of users who already have per_user_limit orders generating are skipped.
+        """
+        async with _connection() as db:
+            async with db.execute(
+                """UPDATE document_orders SET status = 'generating'
+                   WHERE id = (
+                       SELECT o.id FROM document_orders o
+                       WHERE o.status = 'queued'
+                         AND (SELECT COUNT(*) FROM document_orders g
+                              WHERE g.status = 'generating' AND g.user_id = o.user_id) < ?
+                       ORDER BY o.id
+                       LIMIT 1
+                   )
+                   RETURNING *""",
+                (per_user_limit,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            await db.commit()
+            if row:
+                return DocumentOrder(**dict(row))
+            return None
+
+    @staticmethod
+    async def requeue_interrupted_orders() -> int:
+        """Put orders left generating by a previous run back in the queue"""
+        async with _connection() as db:
+            cursor = await db.execute(
+                "UPDATE document_orders SET status = 'queued' WHERE status = 'generating'"
+            )
+            await db.commit()
+            return cursor.rowcount
+
+    @staticmethod
+    async def get_queue_position(order_id: int) -> int:
+        """Get 1-based position of a queued order"""
+        async with _connection() as db:
+            async with db.execute(
+                "SELECT COUNT(*) FROM document_orders WHERE status = 'queued' AND id <= ?",
+                (order_id,)
+            ) as cursor:
+                count = await cursor.fetchone()
+                return count[0] if count else 0
+
+    @staticmethod
+    async def count_pending_orders(user_id: int = None) -> int:
+        """Count queued and generating orders, optionally for one user"""
+        async with _connection() as db:
+            if user_id is None:
+                query, params = "SELECT COUNT(*) FROM document_orders WHERE status IN ('queued', 'generating')", ()
+            else:
+                query, params = "SELECT COUNT(*) FROM document_orders WHERE status IN ('queued', 'generating') AND user_id = ?", (user_id,)
+            async with db.execute(query, params) as cursor:
+                count = await cursor.fetchone()
+                return count[0] if count else 0
+
     @staticmethod
     async def get_document_order(order_id: int) -> Optional[DocumentOrder]:
         """Get document order by ID"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM document_orders WHERE id = ?", (order_id,)
             ) as cursor:
@@ -425,7 +635,7 @@ class Database:
     @staticmethod
     async def update_document_order(order_id: int, status: str, file_path: str = None):
         """Update document order"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             if file_path:
                 await db.execute(
                     "UPDATE document_orders SET status = ?, file_path = ?, completed_at = CURRENT_TIMESTAMP WHERE id = ?",
@@ -441,8 +651,7 @@ class Database:
     @staticmethod
     async def get_user_orders(user_id: int, limit: int = 10) -> List[DocumentOrder]:
         """Get user's recent orders"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM document_orders WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
                 (user_id, limit)
@@ -453,115 +662,238 @@ class Database:
     @staticmethod
     async def get_all_users() -> List[User]:
         """Get all users"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute("SELECT * FROM users ORDER BY created_at DESC") as cursor:
                 rows = await cursor.fetchall()
                 return [User(**dict(row)) for row in rows]
 
+    @staticmethod
+    def _user_filters(active_days: Optional[int] = None, language: Optional[str] = None) -> tuple:
+        """Build the WHERE conditions and parameters shared by iter_users and count_users"""
+        conditions, params = [], []
+        if active_days:
+            conditions.append("updated_at >= datetime('now', ?)")
+            params.append(f"-{int(active_days)} days")
+        if language:
+            conditions.append("language = ?")
+            params.append(language)
+        return conditions, params
+
+    @staticmethod
+    async def iter_users(active_days: Optional[int] = None, language: Optional[str] = None, after_id: int = 0,
+                         newest_first: bool = False, limit: Optional[int] = None,
+                         batch_size: int = 500) -> AsyncIterator[User]:
+        """Yield users one keyset page at a time, in id order (or newest first).
+
+        Filters run in SQL: active_days keeps users active within that many days and
+        language keeps one language. after_id resumes after a user id (before it when
+        newest_first). The connection goes back to the pool between pages, so a slow
+        consumer such as a broadcast does not hold it.
+        """
+        conditions, params = Database._user_filters(active_days, language)
+        cursor_id = after_id or None
+        remaining = limit
+
+        while remaining is None or remaining > 0:
+            page_conditions, page_params = list(conditions), list(params)
+            if cursor_id is not None:
+                page_conditions.append("id < ?" if newest_first else "id > ?")
+                page_params.append(cursor_id)
+            query = "SELECT * FROM users"
+            if page_conditions:
+                query += " WHERE " + " AND ".join(page_conditions)
+            page_size = batch_size if remaining is None else min(batch_size, remaining)
+            query += f" ORDER BY id {'DESC' if newest_first else 'ASC'} LIMIT ?"
+
+            async with _connection() as db:
+                async with db.execute(query, (*page_params, page_size)) as cursor:
+                    rows = await cursor.fetchall()
+
+            for row in rows:
+                yield User(**dict(row))
+            if len(rows) < page_size:
+                return
+            cursor_id = rows[-1]["id"]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    @staticmethod
+    async def count_users(active_days: Optional[int] = None, language: Optional[str] = None) -> int:
+        """Count users matching the iter_users filters"""
+        conditions, params = Database._user_filters(active_days, language)
+        query = "SELECT COUNT(*) FROM users"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        async with _connection() as db:
+            async with db.execute(query, params) as cursor:
+                return (await cursor.fetchone())[0]
+
     @staticmethod
     async def get_active_users(days: int = 30) -> List[User]:
         """Get users active within specified days"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
-                "SELECT * FROM users WHERE updated_at >= datetime('now', '-{} days') ORDER BY updated_at DESC".format(days)
+                "SELECT * FROM users WHERE updated_at >= datetime('now', ?) ORDER BY updated_at DESC",
+                (f"-{int(days)} days",)
             ) as cursor:
                 rows = await cursor.fetchall()
                 return [User(**dict(row)) for row in rows]
 
     @staticmethod
     async def get_user_stats() -> dict:
-        """Get user statistics"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            # Total users
-            async with db.execute("SELECT COUNT(*) FROM users") as cursor:
-                total_users = (await cursor.fetchone())[0]
-
-            # Users today
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE date(created_at) = date('now')"
-            ) as cursor:
-                users_today = (await cursor.fetchone())[0]
-
-            # Users this week
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE created_at >= datetime('now', '-7 days')"
-            ) as cursor:
-                users_week = (await cursor.fetchone())[0]
+        """Get user, order and revenue statistics in one query (one pass per table)"""
+        async with _connection() as db:
+            async with db.execute("""
+                SELECT * FROM
+                    (SELECT COUNT(*) AS total_users,
+                            COALESCE(SUM(created_at >= date('now')), 0) AS users_today,
+                            COALESCE(SUM(created_at >= datetime('now', '-7 days')), 0) AS users_week,
+                            COALESCE(SUM(created_at >= datetime('now', '-30 days')), 0) AS users_month
+                     FROM users),
+                    (SELECT COUNT(*) AS total_payments,
+                            COALESCE(SUM(CASE WHEN status = 'approved' THEN amount END), 0) AS total_revenue,
+                            COALESCE(SUM(CASE WHEN status = 'approved' AND created_at >= datetime('now', '-30 days') THEN amount END), 0) AS revenue_month
+                     FROM payments),
+                    (SELECT COUNT(*) AS total_orders,
+                            COALESCE(SUM(created_at >= datetime('now', '-30 days')), 0) AS orders_month
+                     FROM document_orders),
+                    (SELECT json_group_object(document_type, orders) AS orders_by_type
+                     FROM (SELECT document_type, COUNT(*) AS orders FROM document_orders GROUP BY document_type))
+            """) as cursor:
+                stats = dict(await cursor.fetchone())
 
-            # Users this month
-            async with db.execute(
-                "SELECT COUNT(*) FROM users WHERE created_at >= datetime('now', '-30 days')"
-            ) as cursor:
-                users_month = (await cursor.fetchone())[0]
+        stats['orders_by_type'] = json.loads(stats['orders_by_type'] or "{}")
+        return stats
 
-            # Total revenue
-            async with db.execute(
-                "SELECT COALESCE(SUM(amount), 0) FROM payments WHERE status = 'approved'"
-            ) as cursor:
-                total_revenue = (await cursor.fetchone())[0]
+    @staticmethod
+    async def rollup_daily_stats(lookback_days: int = 3) -> Optional[str]:
+        """Re-aggregate daily_stats from the last rolled-up day minus lookback_days.
 
-            # Revenue this month
-            async with db.execute(
-                "SELECT COALESCE(SUM(amount), 0) FROM payments WHERE status = 'approved' AND created_at >= datetime('now', '-30 days')"
-            ) as cursor:
-                revenue_month = (await cursor.fetchone())[0]
+        The first run back-fills from the oldest user, order or payment. Recent days
+        are recomputed because orders complete and payments are approved later.
+        Returns the first day that was rolled up, or None when there is no data.
+        """
+        async with _connection() as db:
+            async with db.execute("SELECT MAX(day) FROM daily_stats") as cursor:
+                last_day = (await cursor.fetchone())[0]
+            if last_day:
+                async with db.execute("SELECT date(?, ?)", (last_day, f"-{int(lookback_days)} days")) as cursor:
+                    start_day = (await cursor.fetchone())[0]
+            else:
+                async with db.execute("""
+                    SELECT MIN(day) FROM (
+                        SELECT MIN(date(created_at)) AS day FROM users
+                        UNION ALL SELECT MIN(date(created_at)) FROM document_orders
+                        UNION ALL SELECT MIN(date(created_at)) FROM payments
+                    )
+                """) as cursor:
+                    start_day = (await cursor.fetchone())[0]
+            if not start_day:
+                return None
 
-            # Document orders
-            async with db.execute("SELECT COUNT(*) FROM document_orders") as cursor:
-                total_orders = (await cursor.fetchone())[0]
+            await db.execute("DELETE FROM daily_stats WHERE day >= ?", (start_day,))
+            await db.execute("""
+                INSERT INTO daily_stats (day, document_type, language, new_users, orders, completed_orders, payments, revenue)
+                SELECT day, document_type, language, SUM(new_users), SUM(orders), SUM(completed_orders), SUM(payments), SUM(revenue)
+                FROM (
+                    SELECT date(created_at) AS day, '' AS document_type, COALESCE(language, '') AS language,
+                           1 AS new_users, 0 AS orders, 0 AS completed_orders, 0 AS payments, 0 AS revenue
+                    FROM users WHERE created_at >= ?
+                    UNION ALL
+                    SELECT date(o.created_at), o.document_type, COALESCE(u.language, ''), 0, 1, o.status = 'completed', 0, 0
+                    FROM document_orders o LEFT JOIN users u ON u.id = o.user_id
+                    WHERE o.created_at >= ?
+                    UNION ALL
+                    SELECT date(p.created_at), '', COALESCE(u.language, ''), 0, 0, 0, 1, p.amount
+                    FROM payments p LEFT JOIN users u ON u.id = p.user_id
+                    WHERE p.status = 'approved' AND p.created_at >= ?
+                )
+                GROUP BY day, document_type, language
+            """, (start_day, start_day, start_day))
+            await db.commit()
+            return start_day
 
-            # Orders this month
+    @staticmethod
+    async def get_daily_series(days: int = 7) -> List[Dict]:
+        """Get new users, orders and approved revenue per day for the last days (today included) from daily_stats"""
+        async with _connection() as db:
+            async with db.execute("""
+                SELECT day, SUM(new_users) AS users, SUM(orders) AS orders, SUM(revenue) AS revenue
+                FROM daily_stats WHERE day >= date('now', ?) GROUP BY day
+            """, (f"-{int(days) - 1} days",)) as cursor:
+                rows = {row['day']: dict(row) for row in await cursor.fetchall()}
+
+        # Days without activity still get a row
+        today = datetime.utcnow().date()
+        series = []
+        for offset in range(int(days) - 1, -1, -1):
+            day = (today - timedelta(days=offset)).isoformat()
+            series.append(rows.get(day, {'day': day, 'users': 0, 'orders': 0, 'revenue': 0}))
+        return series
+
+    @staticmethod
+    async def get_daily_orders_by_type(day: str) -> Dict[str, int]:
+        """Get the number of orders per document type on a day (YYYY-MM-DD) from daily_stats"""
+        async with _connection() as db:
             async with db.execute(
-                "SELECT COUNT(*) FROM document_orders WHERE created_at >= datetime('now', '-30 days')"
+                "SELECT document_type, SUM(orders) FROM daily_stats WHERE day = ? AND document_type != '' GROUP BY document_type",
+                (day,)
             ) as cursor:
-                orders_month = (await cursor.fetchone())[0]
+                return {row[0]: row[1] for row in await cursor.fetchall()}
 
-            # Orders by type
-            async with db.execute(
-                "SELECT document_type, COUNT(*) FROM document_orders GROUP BY document_type"
-            ) as cursor:
-                orders_by_type = {row[0]: row[1] for row in await cursor.fetchall()}
-
-            return {
-                'total_users': total_users,
-                'users_today': users_today,
-                'users_week': users_week,
-                'users_month': users_month,
-                'total_revenue': total_revenue,
-                'revenue_month': revenue_month,
-                'total_orders': total_orders,
-                'orders_month': orders_month,
-                'orders_by_type': orders_by_type
-            }
-
-    @staticmethod
-    async def create_broadcast_message(message_text: str, message_type: str = 'text', file_id: str = None, target_audience: str = 'all') -> int:
-        """Create broadcast message record"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+    @staticmethod
+    async def create_broadcast_message(message_text: str, message_type: str = 'text', file_id: str = None, target_audience: str = 'all',
+                                       payload: str = None, admin_chat_id: int = None) -> int:
+        """Create broadcast message record (payload is the JSON needed to resend it)"""
+        async with _connection() as db:
             cursor = await db.execute(
-                "INSERT INTO broadcast_messages (message_text, message_type, file_id, target_audience) VALUES (?, ?, ?, ?)",
-                (message_text, message_type, file_id, target_audience)
+                """INSERT INTO broadcast_messages (message_text, message_type, file_id, target_audience, payload, admin_chat_id, status)
+                   VALUES (?, ?, ?, ?, ?, ?, 'running')""",
+                (message_text, message_type, file_id, target_audience, payload, admin_chat_id)
             )
             await db.commit()
             return cursor.lastrowid
 
     @staticmethod
-    async def update_broadcast_stats(broadcast_id: int, sent_count: int, failed_count: int):
-        """Update broadcast message statistics"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+    async def update_broadcast_stats(broadcast_id: int, sent_count: int, failed_count: int,
+                                     last_user_id: int = None, status: str = None):
+        """Update broadcast message statistics, delivery cursor and status"""
+        async with _connection() as db:
             await db.execute(
-                "UPDATE broadcast_messages SET sent_count = ?, failed_count = ?, sent_at = CURRENT_TIMESTAMP WHERE id = ?",
-                (sent_count, failed_count, broadcast_id)
+                """UPDATE broadcast_messages
+                   SET sent_count = ?, failed_count = ?, sent_at = CURRENT_TIMESTAMP,
+                       last_user_id = COALESCE(?, last_user_id), status = COALESCE(?, status)
+                   WHERE id = ?""",
+                (sent_count, failed_count, last_user_id, status, broadcast_id)
             )
             await db.commit()
 
+    @staticmethod
+    async def get_broadcast_message(broadcast_id: int) -> Optional[BroadcastMessage]:
+        """Get broadcast message by ID"""
+        async with _connection() as db:
+            async with db.execute(
+                "SELECT * FROM broadcast_messages WHERE id = ?", (broadcast_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                if row:
+                    return BroadcastMessage(**dict(row))
+                return None
+
+    @staticmethod
+    async def get_unfinished_broadcasts() -> List[BroadcastMessage]:
+        """Get broadcasts that were interrupted before reaching every recipient"""
+        async with _connection() as db:
+            async with db.execute(
+                "SELECT * FROM broadcast_messages WHERE status = 'running' ORDER BY id"
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [BroadcastMessage(**dict(row)) for row in rows]
+
     @staticmethod
     async def get_broadcast_history(limit: int = 10) -> List[BroadcastMessage]:
         """Get broadcast message history"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
-            db.row_factory = aiosqlite.Row
+        async with _connection() as db:
             async with db.execute(
                 "SELECT * FROM broadcast_messages ORDER BY created_at DESC LIMIT ?", (limit,)
             ) as cursor:
@@ -571,7 +903,7 @@ class Database:
     @staticmethod
     async def cleanup_expired_promocodes():
         """Cleanup expired promocodes"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             await db.execute(
                 "UPDATE promocodes SET is_active = FALSE WHERE expires_at < datetime('now') AND is_active = TRUE"
             )
@@ -580,9 +912,81 @@ class Database:
     @staticmethod
     async def get_user_count_by_language() -> dict:
         """Get user count by language"""
-        async with aiosqlite.connect(DATABASE_FILE) as db:
+        async with _connection() as db:
             async with db.execute(
                 "SELECT language, COUNT(*) FROM users GROUP BY language"
             ) as cursor:
                 rows = await cursor.fetchall()
-                return {row[0]: row[1] for row in rows}
\ No newline at end of file
+                return {row[0]: row[1] for row in rows}
+
+    @staticmethod
+    async def get_cached_generation(cache_key: str, max_age_seconds: int) -> Optional[str]:
+        """Get cached generation payload if it is younger than max_age_seconds"""
+        async with _connection() as db:
+            async with db.execute(
+                "SELECT payload FROM generation_cache WHERE cache_key = ? AND created_at >= datetime('now', ?)",
+                (cache_key, f"-{max_age_seconds} seconds")
+            ) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                return None
+
+            await db.execute(
+                "UPDATE generation_cache SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP WHERE cache_key = ?",
+                (cache_key,)
+            )
+            await db.commit()
+            return row[0]
+
+    @staticmethod
+    async def store_cached_generation(cache_key: str, document_type: str, language: str, payload: str,
+                                      topic: str = None, size: int = None):
+        """Store or replace a generation payload"""
+        async with _connection() as db:
+            await db.execute(
+                """INSERT OR REPLACE INTO generation_cache (cache_key, document_type, language, payload, topic, size)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (cache_key, document_type, language, payload, topic, size)
+            )
+            await db.commit()
+
+    @staticmethod
+    async def evict_cached_generations(max_entries: int, max_age_seconds: int) -> int:
+        """Delete expired entries, then least recently used ones beyond max_entries"""
+        async with _connection() as db:
+            cursor = await db.execute(
+                "DELETE FROM generation_cache WHERE created_at < datetime('now', ?)",
+                (f"-{max_age_seconds} seconds",)
+            )
+            removed = cursor.rowcount
+            cursor = await db.execute(
+                """DELETE FROM generation_cache WHERE cache_key NOT IN (
+                       SELECT cache_key FROM generation_cache ORDER BY last_used_at DESC LIMIT ?
+                   )""",
+                (max_entries,)
+            )
+            removed += cursor.rowcount
+            await db.commit()
+            return removed
+
+    @staticmethod
+    async def get_cached_generation_topics(max_age_seconds: int) -> List[tuple]:
+        """Get (cache_key, topic, document_type, language, size) of live cache entries"""
+        async with _connection() as db:
+            async with db.execute(
+                """SELECT cache_key, topic, document_type, language, size FROM generation_cache
+                   WHERE topic IS NOT NULL AND created_at >= datetime('now', ?)""",
+                (f"-{max_age_seconds} seconds",)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [tuple(row) for row in rows]
+
+    @staticmethod
+    async def get_generation_cache_size() -> dict:
+        """Get number of cached generations and their total payload size"""
+        async with _connection() as db:
+            async with db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM generation_cache"
+            ) as cursor:
+                row = await cursor.fetchone()
+                return {'entries': row[0], 'bytes': row[1]}
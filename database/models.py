@@ -57,7 +57,7 @@ class DocumentOrder:
     topic: str
     specifications: str  # JSON with slide count, page count, etc.
     file_path: Optional[str]
-    status: str  # generating, completed, failed
+    status: str  # queued, generating, completed, failed
     created_at: datetime
     completed_at: Optional[datetime]
 
@@ -72,3 +72,7 @@ class BroadcastMessage:
     failed_count: int
     created_at: datetime
     sent_at: Optional[datetime]
+    payload: Optional[str] = None  # JSON message content for resuming
+    admin_chat_id: Optional[int] = None
+    last_user_id: int = 0  # Delivered to every recipient with users.id up to this
+    status: str = 'completed'  # running, completed, failed
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """Fixed-size pool of long-lived aiosqlite connections"""
+
+    def __init__(self, database: str, size: int = 5, pragmas: Optional[Dict[str, object]] = None):
+        self.database = database
+        self.size = max(1, size)
+        self.pragmas = pragmas or {}
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._connections: List[aiosqlite.Connection] = []
+        self._closed = False
+
+        # Metrics
+        self.acquired = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    async def open(self):
+        """Open all pooled connections"""
+        for _ in range(self.size):
+            conn = await self._connect()
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+        logger.info(f"Database pool opened with {self.size} connections to {self.database}")
+
+    async def _connect(self) -> aiosqlite.Connection:
+        """Open a connection and apply per-connection PRAGMAs"""
+        conn = await aiosqlite.connect(self.database)
+        conn.row_factory = aiosqlite.Row
+        for name, value in self.pragmas.items():
+            await conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a connection, waiting if all of them are in use"""
+        if self._closed:
+            raise RuntimeError("Database pool is closed")
+
+        try:
+            conn = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            started = time.monotonic()
+            conn = await self._idle.get()
+            waited = time.monotonic() - started
+            self.waits += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+        self.acquired += 1
+        try:
+            yield conn
+        finally:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                try:
+                    await conn.rollback()
+                except Exception as e:
+                    logger.error(f"Error rolling back pooled connection: {e}")
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        """Close all pooled connections"""
+        self._closed = True
+        for conn in self._connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.error(f"Error closing pooled connection: {e}")
+        self._connections.clear()
+        logger.info("Database pool closed")
+
+    def stats(self) -> dict:
+        """Get pool usage metrics"""
+        return {
+            'size': self.size,
+            'idle': self._idle.qsize(),
+            'acquired': self.acquired,
+            'waits': self.waits,
+            'wait_time_total': round(self.wait_time_total, 3),
+            'wait_time_avg': round(self.wait_time_total / self.waits, 4) if self.waits else 0.0,
+            'wait_time_max': round(self.wait_time_max, 4)
+        }
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import os
+from functools import partial
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher
 
@@ -12,8 +13,22 @@ from aiogram.fsm.storage.memory import MemoryStorage
 
 from bot.handlers import start, documents, payments, admin, settings
 from bot.middlewares import LanguageMiddleware, DatabaseMiddleware
-from database.database import init_db
-from config import BOT_TOKEN, ADMIN_IDS
+from database.database import init_db, close_db
+from services.render_service import shutdown_render_executor
+from services.job_queue import GenerationQueue
+from services.broadcast_service import BroadcastService
+from services.stats_service import DailyRollupJob
+from services.clients import create_http_session, set_http_session, get_openai_client, close_openai_client
+from services.image_cache import image_cache
+from services.ai_service_new import AIService
+from services.ai_service import AIService as OldAIService
+from services.document_service_new import DocumentService
+from services.document_service import DocumentService as OldDocumentService
+from services.template_service import TemplateService
+from config import (
+    BOT_TOKEN, ADMIN_IDS, JOB_WORKERS, JOB_PER_USER_CONCURRENCY,
+    JOB_MAX_PENDING_PER_USER, JOB_QUEUE_MAX_PENDING
+)
 
 # Configure logging
 logging.basicConfig(
@@ -35,6 +50,37 @@ async def main():
     
     dp = Dispatcher(storage=MemoryStorage())
     
+    # One pooled HTTP session for image downloads and Pexels
+    http_session = create_http_session()
+    set_http_session(http_session)
+    
+    # Application-scoped services sharing one OpenAI client
+    openai_client = get_openai_client()
+    ai_service = AIService(client=openai_client, http_session=http_session)
+    
+    # Document generation runs in queue workers, not in update handlers
+    job_queue = GenerationQueue(
+        partial(
+            documents.run_document_order, bot,
+            doc_service=DocumentService(ai_service=ai_service),
+            document_ai_service=OldAIService(client=openai_client),
+            sectioned_doc_service=OldDocumentService(),
+            template_service=TemplateService()
+        ),
+        workers=JOB_WORKERS,
+        per_user_limit=JOB_PER_USER_CONCURRENCY,
+        max_user_pending=JOB_MAX_PENDING_PER_USER,
+        max_pending=JOB_QUEUE_MAX_PENDING
+    )
+    dp["job_queue"] = job_queue
+    
+    # Advertisement broadcasts run in the background and resume after restarts
+    broadcast_service = BroadcastService(bot)
+    dp["broadcast_service"] = broadcast_service
+    
+    # Admin statistics read the daily rollup, refreshed off the hot path
+    rollup_job = DailyRollupJob()
+    
     # Register middlewares
     dp.message.middleware(DatabaseMiddleware())
     dp.callback_query.middleware(DatabaseMiddleware())
@@ -49,11 +95,23 @@ async def main():
     dp.include_router(documents.router)  # Last - handles document creation and topic input
     
     # Start polling
+    await job_queue.start()
+    await broadcast_service.start()
+    await rollup_job.start()
     logger.info("Bot started")
     try:
         await dp.start_polling(bot)
     finally:
+        await rollup_job.stop()
+        await broadcast_service.stop()
+        await job_queue.stop()
+        await image_cache.flush()
         await bot.session.close()
+        set_http_session(None)
+        await http_session.close()
+        await close_openai_client()
+        await close_db()
+        shutdown_render_executor()
 
 if __name__ == "__main__":
     asyncio.run(main())
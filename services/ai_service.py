@@ -1,18 +1,22 @@
 import json
 import logging
 from openai import AsyncOpenAI
-import os
-import aiohttp
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List, Optional
 import asyncio
+from config import AI_SECTION_CONCURRENCY, AI_RETRY_ATTEMPTS
+from utils.helpers import retry_async
+from services.generation_cache import generation_cache
+from services.clients import download_to_file, get_openai_client
+from services.rate_limiter import openai_limiter
+from services.progress import report_progress
 
 logger = logging.getLogger(__name__)
 
 class AIService:
-    def __init__(self):
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = client or get_openai_client()
         self.model = "gpt-4o"
 
     async def generate_presentation_content(self, topic: str, slide_count: int, language: str) -> Dict:
@@ -126,7 +130,8 @@ Respond in JSON format:
     ]
 }}"""
 
-            response = await self.client.chat.completions.create(
+            response = await openai_limiter.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
@@ -159,31 +164,93 @@ Respond in JSON format:
             logger.error(f"Error generating presentation content: {e}")
             raise
 
-    async def generate_document_content(self, topic: str, section_count: int, document_type: str, language: str) -> Dict:
-        """Generate document content with AI - each section separately"""
+    async def generate_document_content(self, topic: str, section_count: int, document_type: str, language: str,
+                                        fresh: bool = False,
+                                        on_outline: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+                                        on_section: Optional[Callable[[int, Optional[str]], Awaitable[None]]] = None) -> Dict:
+        """Generate document content with AI - each section separately.
+
+        on_outline is awaited with the section titles before sections are generated,
+        and on_section with (index, text) as each section finishes. With on_section a
+        section that fails after retries is reported as None and left out instead of
+        failing the whole document; such content is marked partial and not cached.
+        Neither callback is called when the content comes from the cache.
+        """
+        similar = None
+        if not fresh:
+            cached = await generation_cache.get(topic, language, document_type, section_count)
+            if cached:
+                cached['cached'] = True
+                return cached
+            # A near-duplicate topic's outline fits this topic too; sections and
+            # references are still written for the requested topic
+            similar = await generation_cache.get_similar(topic, language, document_type, section_count)
+
         try:
             # First, generate the outline
-            outline = await self._generate_document_outline(topic, section_count, document_type, language)
-
-            # Then generate each section individually
-            sections = []
-            for i, section_title in enumerate(outline['sections']):
-                section_content = await self._generate_section_content(
-                    topic, section_title, i + 1, section_count, document_type, language
-                )
-                sections.append({
-                    "title": section_title,
-                    "content": section_content
-                })
-
-            # Generate references
-            references = await self._generate_references(topic, language)
-
-            return {
+            if similar:
+                section_titles = [section['title'] for section in similar[0]['sections']]
+            else:
+                report_progress("outline")
+                outline = await self._generate_document_outline(topic, section_count, document_type, language)
+                section_titles = outline['sections']
+
+            if on_outline:
+                await on_outline(section_titles)
+
+            # Sections and references only depend on the outline, so fan them out
+            semaphore = asyncio.Semaphore(AI_SECTION_CONCURRENCY)
+            finished = 0
+            report_progress("outline", 1, 1)
+            report_progress("sections", 0, len(section_titles))
+
+            async def generate_section(index: int, section_title: str) -> Optional[str]:
+                nonlocal finished
+                async with semaphore:
+                    try:
+                        section_content = await retry_async(
+                            self._generate_section_content,
+                            topic, section_title, index + 1, section_count, document_type, language,
+                            # Only empty output is retried here, API errors were already retried by the limiter
+                            attempts=AI_RETRY_ATTEMPTS, retry_on=(ValueError,)
+                        )
+                    except Exception as e:
+                        if not on_section:
+                            raise
+                        logger.error(f"Section {index + 1} of {document_type} failed, leaving it out: {e}")
+                        section_content = None
+                finished += 1
+                report_progress("sections", finished, len(section_titles))
+                if on_section:
+                    await on_section(index, section_content)
+                return section_content
+
+            section_tasks = [
+                generate_section(i, section_title)
+                for i, section_title in enumerate(section_titles)
+            ]
+            *section_contents, references = await asyncio.gather(
+                *section_tasks, self._generate_references(topic, language)
+            )
+
+            sections = [
+                {"title": section_title, "content": section_content}
+                for section_title, section_content in zip(section_titles, section_contents)
+                if section_content is not None
+            ]
+            if not sections:
+                raise ValueError(f"No sections were generated for {topic}")
+
+            content = {
                 "title": topic,
                 "sections": sections,
                 "references": references
             }
+            if len(sections) < len(section_titles):
+                content['partial'] = True
+            else:
+                await generation_cache.set(topic, language, document_type, section_count, content)
+            return content
 
         except Exception as e:
             logger.error(f"Error generating document content: {e}")
@@ -268,7 +335,8 @@ Respond in JSON format:
     ]
 }}"""
 
-            response = await self.client.chat.completions.create(
+            response = await openai_limiter.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
@@ -472,7 +540,8 @@ IMPORTANT REQUIREMENTS:
 - Each idea fully substantiated
 - Section connected to other sections"""
 
-            response = await self.client.chat.completions.create(
+            response = await openai_limiter.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "Siz akademik yozuvchi sifatida har xil uzunlikdagi jumlalar, izchil bog'lanish va boy misollar bilan mustaqil ishlar yozasiz"},
@@ -484,7 +553,9 @@ IMPORTANT REQUIREMENTS:
                 max_tokens=4000
             )
 
-            matn = response.choices[0].message.content.strip()
+            matn = (response.choices[0].message.content or "").strip()
+            if not matn:
+                raise ValueError(f"Empty content for section {section_num}")
             
             # Bo'sh qatorlarni tozalash
             matn = matn.replace('\n\n', ' ')  # ikki bo'sh qatorni bitta bo'shliqqa
@@ -532,7 +603,8 @@ The reference list should be diverse:
 
 Each source should look realistic and relevant to the topic."""
 
-            response = await self.client.chat.completions.create(
+            response = await openai_limiter.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.7
@@ -568,7 +640,8 @@ Each source should look realistic and relevant to the topic."""
             else:  # English
                 prompt = f"Professional academic illustration for: {slide_title}. Clean, educational style, high quality."
 
-            response = await self.client.images.generate(
+            response = await openai_limiter.image_generation(
+                self.client,
                 model="dall-e-3",
                 prompt=prompt,
                 n=1,
@@ -584,16 +657,4 @@ Each source should look realistic and relevant to the topic."""
 
     async def download_image(self, image_url: str, file_path: str):
         """Download image from URL to local file"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status == 200:
-                        with open(file_path, 'wb') as f:
-                            f.write(await response.read())
-                        return file_path
-                    else:
-                        logger.error(f"Failed to download image: HTTP {response.status}")
-                        return None
-        except Exception as e:
-            logger.error(f"Error downloading image: {e}")
-            return None
\ No newline at end of file
+        return await download_to_file(image_url, file_path)
\ No newline at end of file
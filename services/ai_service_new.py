@@ -5,39 +5,124 @@ import string
 from datetime import datetime
 from typing import Dict, List, Optional
 import aiohttp
-import os
 from openai import AsyncOpenAI
+from config import AI_BATCH_CONCURRENCY, AI_RETRY_ATTEMPTS
+from utils.helpers import retry_async
+from services.generation_cache import generation_cache
+from services.image_cache import image_cache
+from services.workspace import workspace_path
+from services.clients import download_to_file, get_openai_client
+from services.rate_limiter import openai_limiter
+from services.progress import report_progress
 
 logger = logging.getLogger(__name__)
 
 class AIService:
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, client: Optional[AsyncOpenAI] = None, http_session: Optional[aiohttp.ClientSession] = None):
+        # All services share one OpenAI client and its connection pool
+        self.client = client or get_openai_client()
         self.model = "gpt-4o"
+        # None falls back to the application session registered in main.py
+        self.http_session = http_session
+
+    async def generate_presentation_in_batches(self, topic: str, slide_count: int, language: str, fresh: bool = False) -> Dict:
+        """Generate presentation content using batch method for better results.
+
+        Cached content for the same topic/language/size is returned (marked with
+        "cached") unless fresh is set.
+        """
+        slide_titles = None
+        if not fresh:
+            cached = await self.get_cached_presentation(topic, slide_count, language)
+            if cached:
+                return cached
+            slide_titles = await self.get_similar_slide_titles(topic, slide_count, language)
 
-    async def generate_presentation_in_batches(self, topic: str, slide_count: int, language: str) -> Dict:
-        """Generate presentation content using batch method for better results"""
         logger.info(f"Starting batch presentation generation for '{topic}' with {slide_count} slides in {language}")
         
-        all_slides = []
-        
-        # Generate in batches of 3 slides
-        for batch_start in range(1, slide_count + 1, 3):
-            batch_end = min(batch_start + 2, slide_count)
-            logger.info(f"Generating batch: slides {batch_start}-{batch_end}")
-            
-            batch_content = await self._generate_slide_batch(topic, batch_start, batch_end, slide_count, language)
-            if batch_content and 'slides' in batch_content:
-                all_slides.extend(batch_content['slides'])
-            
-            # Small delay between batches
-            if batch_end < slide_count:
-                await asyncio.sleep(0.5)
+        batches = {}
+        async for batch_index, slides in self.iter_presentation_batches(topic, slide_count, language, slide_titles):
+            batches[batch_index] = slides
 
-        logger.info(f"Generated complete presentation with {len(all_slides)} slides")
-        return {"slides": all_slides}
+        # Reassemble in slide order regardless of completion order
+        all_slides = [slide for batch_index in sorted(batches) for slide in batches[batch_index]]
 
-    async def _generate_slide_batch(self, topic: str, start_slide: int, end_slide: int, total_slides: int, language: str) -> Dict:
+        logger.info(f"Generated complete presentation with {len(all_slides)} slides")
+        content = {"slides": all_slides}
+        # Only complete presentations are reused; a failed batch would otherwise stick around
+        if len(all_slides) < slide_count:
+            content['partial'] = True
+        else:
+            await generation_cache.set(topic, language, "presentation", slide_count, content)
+        return content
+
+    async def get_cached_presentation(self, topic: str, slide_count: int, language: str) -> Optional[Dict]:
+        """Get cached slides for exactly this topic and size"""
+        cached = await generation_cache.get(topic, language, "presentation", slide_count)
+        if cached:
+            cached['cached'] = True
+        return cached
+
+    async def get_similar_slide_titles(self, topic: str, slide_count: int, language: str) -> Optional[List[str]]:
+        """Get the slide titles of a cached near-duplicate topic to use as this topic's outline.
+
+        Only the outline is reused; slide text is always written for the requested topic.
+        """
+        similar = await generation_cache.get_similar(topic, language, "presentation", slide_count)
+        if not similar:
+            return None
+        titles = [slide.get('title', '') for slide in similar[0].get('slides', [])]
+        return titles if len(titles) >= slide_count and all(titles) else None
+
+    async def iter_presentation_batches(self, topic: str, slide_count: int, language: str,
+                                        slide_titles: Optional[List[str]] = None):
+        """Yield (batch_index, slides) for each 3-slide batch as soon as it completes.
+
+        slide_titles, when given, are used as the titles of the generated slides.
+        """
+        # Batches run concurrently; callers can start work on a batch before the rest are done
+        semaphore = asyncio.Semaphore(AI_BATCH_CONCURRENCY)
+        batches = [
+            (batch_start, min(batch_start + 2, slide_count))
+            for batch_start in range(1, slide_count + 1, 3)
+        ]
+
+        async def run_batch(batch_index: int, start: int, end: int):
+            titles = slide_titles[start - 1:end] if slide_titles else None
+            batch_content = await self._generate_slide_batch_with_retry(semaphore, topic, start, end, slide_count, language, titles)
+            return batch_index, batch_content['slides']
+
+        tasks = [
+            asyncio.create_task(run_batch(batch_index, start, end))
+            for batch_index, (start, end) in enumerate(batches)
+        ]
+        try:
+            report_progress("slides", 0, len(tasks))
+            for finished, next_batch in enumerate(asyncio.as_completed(tasks), 1):
+                result = await next_batch
+                report_progress("slides", finished, len(tasks))
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_slide_batch_with_retry(self, semaphore: asyncio.Semaphore, topic: str, start_slide: int, end_slide: int, total_slides: int, language: str,
+                                               titles: Optional[List[str]] = None) -> Dict:
+        """Generate one batch under the concurrency limit, retrying it on failure"""
+        async with semaphore:
+            logger.info(f"Generating batch: slides {start_slide}-{end_slide}")
+            try:
+                return await retry_async(
+                    self._generate_slide_batch, topic, start_slide, end_slide, total_slides, language, titles,
+                    # openai_limiter owns API error retries; this only retries bad JSON or empty batches
+                    attempts=AI_RETRY_ATTEMPTS, retry_on=(ValueError,)
+                )
+            except Exception as e:
+                logger.error(f"Giving up on batch {start_slide}-{end_slide}: {e}")
+                return {"slides": []}
+
+    async def _generate_slide_batch(self, topic: str, start_slide: int, end_slide: int, total_slides: int, language: str,
+                                    titles: Optional[List[str]] = None) -> Dict:
         """Generate a batch of 3 slides with proper layout assignment"""
         
         # Create slide layout mapping for this batch
@@ -56,13 +141,18 @@ class AIService:
         }
         
         lang_instruction = language_instructions.get(language, "O'zbek tilida")
+
+        title_instruction = ""
+        if titles:
+            title_lines = "\n".join(f"Slide {start_slide + i}: {title}" for i, title in enumerate(titles))
+            title_instruction = f"\nUse these slide titles and write the content for \"{topic}\":\n{title_lines}\n"
         
         prompt = f"""
 Generate content for slides {start_slide}-{end_slide} of {total_slides} for presentation about "{topic}". {lang_instruction}.
 
 CRITICAL LAYOUT REQUIREMENTS:
 {self._get_layout_descriptions(slides_info)}
-
+{title_instruction}
 For each slide, provide:
 - slide_number: {start_slide} to {end_slide}
 - title: Relevant slide title
@@ -86,21 +176,22 @@ Example format:
 }}
 """
 
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
-            
-            content_text = response.choices[0].message.content
-            import json
-            return json.loads(content_text)
-            
-        except Exception as e:
-            logger.error(f"Error generating batch {start_slide}-{end_slide}: {e}")
-            return {"slides": []}
+        response = await openai_limiter.chat_completion(
+            self.client,
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            temperature=0.7
+        )
+        
+        content_text = response.choices[0].message.content
+        if not content_text:
+            raise ValueError(f"Empty response for batch {start_slide}-{end_slide}")
+        import json
+        content = json.loads(content_text)
+        if not content.get('slides'):
+            raise ValueError(f"No slides returned for batch {start_slide}-{end_slide}")
+        return content
 
     def _get_layout_type(self, slide_number: int) -> str:
         """Determine layout type based on slide number using rotating 4-layout system"""
@@ -145,7 +236,8 @@ Example format:
             logger.info(f"Generating DALL-E image: {image_prompt[:50]}...")
 
             # NO TIMEOUT - Generate DALL-E image
-            response = await self.client.images.generate(
+            response = await openai_limiter.image_generation(
+                self.client,
                 model="dall-e-3",
                 prompt=image_prompt,
                 size="1024x1024",
@@ -165,27 +257,30 @@ Example format:
             logger.error(f"Error generating DALL-E image: {e}")
             return None
 
-    async def download_image(self, image_url: str, filename: str) -> str | None:
-        """Download image from URL and save to temp folder"""
-        try:
-            import os
-            os.makedirs("temp", exist_ok=True)
-            file_path = os.path.join("temp", filename)
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status == 200:
-                        with open(file_path, 'wb') as f:
-                            f.write(await response.read())
-                        logger.info(f"Downloaded image: {file_path}")
-                        return file_path
-                    else:
-                        logger.error(f"Failed to download image: HTTP {response.status}")
-                        return None
+    async def get_slide_image(self, prompt: str, slide_title: str, filename: str) -> str | None:
+        """Get a DALL-E image for a slide from the image cache, generating it on a miss"""
+        # The image prompt is built from the slide title only, so the title is the key
+        cache_key = image_cache.make_key("dalle", slide_title)
+        cached_path = await image_cache.get(cache_key)
+        if cached_path:
+            logger.info(f"Image cache hit for slide '{slide_title}'")
+            return cached_path
+
+        image_url = await self.generate_dalle_image(prompt, slide_title)
+        if not image_url:
+            return None
 
-        except Exception as e:
-            logger.error(f"Error downloading image: {e}")
+        image_path = await self.download_image(image_url, filename)
+        if not image_path:
             return None
+        return await image_cache.put_file(cache_key, image_path)
+
+    async def download_image(self, image_url: str, filename: str) -> str | None:
+        """Download image from URL and save to the job workspace"""
+        file_path = await download_to_file(image_url, workspace_path(filename), self.http_session)
+        if file_path:
+            logger.info(f"Downloaded image: {file_path}")
+        return file_path
 
     async def generate_independent_work(self, topic: str, page_count: int, language: str) -> Dict:
         """Generate independent work content"""
@@ -222,7 +317,8 @@ JSON formatida qaytaring:
 """
 
         try:
-            response = await self.client.chat.completions.create(
+            response = await openai_limiter.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
@@ -289,7 +385,8 @@ JSON formatida qaytaring:
 """
 
         try:
-            response = await self.client.chat.completions.create(
+            response = await openai_limiter.chat_completion(
+                self.client,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
@@ -0,0 +1,157 @@
+"""
+Broadcast Service
+Background, rate-limited advertisement delivery that resumes after a restart
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from database.database import Database
+from database.models import BroadcastMessage, User
+from services.rate_limiter import TokenBucket
+from config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# iter_users filters for each broadcast target audience
+BROADCAST_TARGETS = {
+    "all": {},
+    "active": {"active_days": 30},
+}
+
+# Bot method and argument name for each stored message type
+MEDIA_SENDERS = {
+    "photo": ("send_photo", "photo", "photo_id"),
+    "video": ("send_video", "video", "video_id"),
+    "document": ("send_document", "document", "document_id"),
+    "animation": ("send_animation", "animation", "animation_id"),
+    "voice": ("send_voice", "voice", "voice_id"),
+    "audio": ("send_audio", "audio", "audio_id"),
+}
+
+class BroadcastService:
+    """Sends broadcasts in the background under one global message rate.
+
+    Recipients are walked in users.id order one page at a time; after each page the
+    counters and the last delivered user id are checkpointed, so a broadcast that is
+    interrupted resumes from that page on the next start.
+    """
+
+    def __init__(self, bot: Bot, rate: float = BROADCAST_RATE, concurrency: int = BROADCAST_CONCURRENCY,
+                 page_size: int = BROADCAST_PAGE_SIZE):
+        self.bot = bot
+        self.page_size = page_size
+        # One second of burst at most, shared by all running broadcasts
+        self._bucket = TokenBucket(rate * 60, capacity=rate)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._paused_until = 0.0
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def start(self):
+        """Resume broadcasts interrupted by a shutdown"""
+        for broadcast in await Database.get_unfinished_broadcasts():
+            logger.info(f"Resuming broadcast {broadcast.id} after user {broadcast.last_user_id}")
+            self._spawn(broadcast)
+
+    async def stop(self):
+        """Stop sending; unfinished broadcasts stay 'running' and resume on next start"""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    async def launch(self, admin_chat_id: int, target_audience: str, data: Dict) -> int:
+        """Record a broadcast of the admin's message data and start sending it; returns its id"""
+        message_type = data.get('message_type', 'text')
+        media_key = MEDIA_SENDERS[message_type][2] if message_type in MEDIA_SENDERS else None
+        payload = {key: data[key] for key in ('message_type', 'message_text', 'caption', media_key) if key in data}
+        broadcast_id = await Database.create_broadcast_message(
+            data.get('message_text') or data.get('caption') or "",
+            message_type, data.get(media_key), target_audience,
+            payload=json.dumps(payload), admin_chat_id=admin_chat_id
+        )
+        self._spawn(await Database.get_broadcast_message(broadcast_id))
+        return broadcast_id
+
+    def _spawn(self, broadcast: BroadcastMessage):
+        task = asyncio.create_task(self._run(broadcast))
+        self._tasks[broadcast.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast.id, None))
+
+    async def _run(self, broadcast: BroadcastMessage):
+        data = json.loads(broadcast.payload or "{}")
+        sent_count = broadcast.sent_count or 0
+        failed_count = broadcast.failed_count or 0
+        cursor = broadcast.last_user_id or 0
+
+        async def send_page(page: List[User]):
+            nonlocal sent_count, failed_count, cursor
+            results = await asyncio.gather(*[self._send(user.telegram_id, data) for user in page])
+            sent = sum(results)
+            sent_count += sent
+            failed_count += len(results) - sent
+            cursor = page[-1].id
+            await Database.update_broadcast_stats(broadcast.id, sent_count, failed_count, last_user_id=cursor)
+
+        try:
+            page = []
+            filters = BROADCAST_TARGETS.get(broadcast.target_audience, {})
+            async for user in Database.iter_users(after_id=cursor, batch_size=self.page_size, **filters):
+                page.append(user)
+                if len(page) >= self.page_size:
+                    await send_page(page)
+                    page = []
+            if page:
+                await send_page(page)
+
+            await Database.update_broadcast_stats(broadcast.id, sent_count, failed_count, status='completed')
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {broadcast.id} stopped after user {cursor}: {e}")
+            await Database.update_broadcast_stats(broadcast.id, sent_count, failed_count, status='failed')
+            return
+
+        logger.info(f"Broadcast {broadcast.id} finished: {sent_count} sent, {failed_count} failed")
+        if broadcast.admin_chat_id:
+            try:
+                await self.bot.send_message(
+                    broadcast.admin_chat_id,
+                    f"✅ Reklama yuborish yakunlandi:\n\n"
+                    f"📊 Tur: {broadcast.message_type.title()}\n"
+                    f"✅ {sent_count} ta yuborildi\n"
+                    f"❌ {failed_count} ta foydalanuvchiga yetmadi"
+                )
+            except Exception as e:
+                logger.warning(f"Could not report broadcast {broadcast.id} result: {e}")
+
+    async def _send(self, telegram_id: int, data: Dict, attempts: int = 3) -> bool:
+        """Send one message within the global rate; True when delivered"""
+        message_type = data.get('message_type', 'text')
+        async with self._semaphore:
+            for _ in range(attempts):
+                # A flood wait applies to the whole bot, so every sender waits it out
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                await self._bucket.acquire()
+                try:
+                    if message_type in MEDIA_SENDERS:
+                        method, argument, key = MEDIA_SENDERS[message_type]
+                        await getattr(self.bot, method)(telegram_id, **{argument: data[key]}, caption=data.get('caption'))
+                    else:
+                        await self.bot.send_message(telegram_id, data['message_text'])
+                    return True
+                except TelegramRetryAfter as e:
+                    logger.warning(f"Broadcast flood limit, pausing {e.retry_after}s")
+                    self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                except TelegramForbiddenError:
+                    return False  # Blocked the bot or deactivated
+                except Exception as e:
+                    logger.error(f"Failed to send {message_type} to {telegram_id}: {e}")
+                    return False
+        return False
@@ -1,23 +1,41 @@
+import asyncio
 import logging
-from typing import List
+import time
+from typing import Dict, List, Tuple
 from aiogram import Bot
-from aiogram.exceptions import TelegramAPIError
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, TelegramNotFound
 from database.models import Channel
+from config import CHANNEL_ACCESS_TTL, CHANNEL_MEMBERSHIP_TTL
 
 logger = logging.getLogger(__name__)
 
+# Shared by every ChannelService instance (handlers create one per update):
+# channel_id -> (bot can access it, expires) and telegram user id -> {channel_id: (subscribed, expires)}
+_channel_access: Dict[str, Tuple[bool, float]] = {}
+_memberships: Dict[int, Dict[str, Tuple[bool, float]]] = {}
+
+# Telegram answers that settle access/membership; anything else (RetryAfter, network
+# and server errors, which also subclass TelegramAPIError) is transient and not cached
+DEFINITIVE_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound)
+
 class ChannelService:
     def __init__(self, bot: Bot):
         self.bot = bot
     
-    async def check_user_subscription(self, user_id: int, channels: List[Channel]) -> bool:
-        """Check if user is subscribed to all required channels"""
+    async def check_user_subscription(self, user_id: int, channels: List[Channel], fresh: bool = False) -> bool:
+        """Check if user is subscribed to all required channels.
+
+        Channel access and the user's memberships are cached briefly; fresh drops the
+        user's cached memberships first (the "check subscription" button).
+        """
+        if fresh:
+            invalidate_user_subscriptions(user_id)
         try:
-            accessible_channels = []
-            
             # First, check which channels are accessible
-            for channel in channels:
-                if await self._validate_channel_access(channel.channel_id):
+            access = await asyncio.gather(*[self._validate_channel_access(channel.channel_id) for channel in channels])
+            accessible_channels = []
+            for channel, accessible in zip(channels, access):
+                if accessible:
                     accessible_channels.append(channel)
                 else:
                     logger.warning(f"Channel {channel.channel_id} is not accessible to bot - skipping subscription check")
@@ -28,10 +46,10 @@ class ChannelService:
                 return True
             
             # Check subscription to accessible channels only
-            for channel in accessible_channels:
-                if not await self._is_user_subscribed(user_id, channel.channel_id):
-                    return False
-            return True
+            subscribed = await asyncio.gather(*[
+                self._is_user_subscribed(user_id, channel.channel_id) for channel in accessible_channels
+            ])
+            return all(subscribed)
             
         except Exception as e:
             logger.error(f"Error checking user subscription: {e}")
@@ -40,31 +58,47 @@ class ChannelService:
     
     async def _is_user_subscribed(self, user_id: int, channel_id: str) -> bool:
         """Check if user is subscribed to a specific channel"""
+        cached = _memberships.get(user_id, {}).get(channel_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
         try:
             member = await self.bot.get_chat_member(chat_id=channel_id, user_id=user_id)
             
             # User is subscribed if they are member, administrator, or creator
-            return member.status in ['member', 'administrator', 'creator']
+            subscribed = member.status in ['member', 'administrator', 'creator']
             
-        except TelegramAPIError as e:
+        except DEFINITIVE_ERRORS as e:
             # User is not a member or channel doesn't exist
             logger.warning(f"User {user_id} not found in channel {channel_id}: {e}")
-            return False
+            subscribed = False
         except Exception as e:
+            # Not cached: flood waits, network and server errors say nothing about membership
             logger.error(f"Error checking subscription for user {user_id} in channel {channel_id}: {e}")
             return False
+
+        _remember_membership(user_id, channel_id, subscribed)
+        return subscribed
             
     async def _validate_channel_access(self, channel_id: str) -> bool:
         """Check if bot has access to the channel"""
+        cached = _channel_access.get(channel_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
         try:
-            chat = await self.bot.get_chat(chat_id=channel_id)
-            return True
-        except TelegramAPIError as e:
+            await self.bot.get_chat(chat_id=channel_id)
+            accessible = True
+        except DEFINITIVE_ERRORS as e:
             logger.warning(f"Bot cannot access channel {channel_id}: {e}")
-            return False
+            accessible = False
         except Exception as e:
+            # Not cached, so a flood wait or network error affects this check only
             logger.error(f"Error validating channel access {channel_id}: {e}")
             return False
+
+        _channel_access[channel_id] = (accessible, time.monotonic() + CHANNEL_ACCESS_TTL)
+        return accessible
     
     async def validate_channel(self, channel_id: str) -> bool:
         """Validate if channel exists and bot has access"""
@@ -106,3 +140,22 @@ class ChannelService:
         except Exception as e:
             logger.warning(f"Could not get member count for {channel_id}: {e}")
             return 0
+
+def _remember_membership(user_id: int, channel_id: str, subscribed: bool):
+    now = time.monotonic()
+    # Drop users whose entries have all expired once the cache grows
+    if len(_memberships) > 10000:
+        for stale_user in [uid for uid, entries in _memberships.items() if all(exp <= now for _, exp in entries.values())]:
+            del _memberships[stale_user]
+    _memberships.setdefault(user_id, {})[channel_id] = (subscribed, now + CHANNEL_MEMBERSHIP_TTL)
+
+def invalidate_user_subscriptions(user_id: int):
+    """Forget a user's cached channel memberships"""
+    _memberships.pop(user_id, None)
+
+def invalidate_channel_access(channel_id: str = None):
+    """Forget cached channel access (one channel, or all)"""
+    if channel_id is None:
+        _channel_access.clear()
+    else:
+        _channel_access.pop(channel_id, None)
@@ -0,0 +1,100 @@
+"""
+Shared Network Clients
+Application-scoped aiohttp session, OpenAI client and streaming download helper
+"""
+
+import logging
+import os
+from typing import Optional
+import aiohttp
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from config import (
+    OPENAI_API_KEY, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT, HTTP_TOTAL_TIMEOUT, OPENAI_TIMEOUT, OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE
+)
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_http_session: Optional[aiohttp.ClientSession] = None
+_openai_client: Optional[AsyncOpenAI] = None
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Create a connection-pooled session with keep-alive and timeouts"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=300
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TOTAL_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+def set_http_session(session: Optional[aiohttp.ClientSession]):
+    """Register the application session used by services that were not given one"""
+    global _http_session
+    _http_session = session
+
+def get_http_session() -> Optional[aiohttp.ClientSession]:
+    """Get the application session registered in main.py, if any"""
+    return _http_session
+
+def create_openai_client() -> AsyncOpenAI:
+    """Create an OpenAI client with tuned connection limits and timeouts.
+
+    SDK retries are disabled; services.rate_limiter owns backoff for 429/5xx.
+    """
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY or os.getenv("OPENAI_API_KEY"),
+        max_retries=0,
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_TIMEOUT
+            )
+        )
+    )
+
+def get_openai_client() -> AsyncOpenAI:
+    """Get the shared OpenAI client, creating it on first use"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = create_openai_client()
+    return _openai_client
+
+async def close_openai_client():
+    """Close the shared OpenAI client and its connection pool"""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+async def download_to_file(url: str, file_path: str, session: Optional[aiohttp.ClientSession] = None) -> Optional[str]:
+    """Stream url to file_path in chunks; returns file_path, or None on failure"""
+    session = session or get_http_session()
+    if session is None:
+        # Scripts and workers without an application session
+        async with create_http_session() as own_session:
+            return await download_to_file(url, file_path, own_session)
+
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                logger.error(f"Failed to download image: HTTP {response.status}")
+                return None
+            with open(file_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        return file_path
+    except Exception as e:
+        logger.error(f"Error downloading {url[:50]}: {e}")
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        return None
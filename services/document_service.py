@@ -1,6 +1,5 @@
 import os
 import logging
-from datetime import datetime
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -11,9 +10,11 @@ from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
 from typing import Dict, Optional, List
 import asyncio
-import aiohttp
 from config import DOCUMENTS_DIR, TEMP_DIR, PEXELS_API_KEY
 from bot.services.pexels import PexelsService
+from services.workspace import workspace_path
+from services.clients import download_to_file
+from utils.helpers import unique_filename
 
 logger = logging.getLogger(__name__)
 
@@ -71,8 +72,7 @@ class DocumentService:
                 new_slide = self._add_content_slide(prs, slide_data, i + 1, slide_images)
 
             # Save presentation
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"presentation_{timestamp}.pptx"
+            filename = unique_filename("presentation", ".pptx")
             file_path = os.path.join(self.documents_dir, filename)
 
             prs.save(file_path)
@@ -231,20 +231,12 @@ class DocumentService:
                 search_query = self._extract_search_keywords(slide_title, slide_content, topic)
 
                 if search_query:
-                    # Search for images
-                    photos = await self.pexels.search_images(search_query, per_page=1)
+                    # Search and download, reusing cached images for repeated queries
+                    image_path = await self.pexels.get_cached_image(search_query, f"template_slide_{slide_num}.jpg")
 
-                    if photos:
-                        photo = photos[0]
-                        image_url = self.pexels.get_image_url(photo, "medium")
-
-                        # Download image
-                        filename = f"template_slide_{slide_num}.jpg"
-                        image_path = await self.pexels.download_image(image_url, filename)
-
-                        if image_path:
-                            slide_images[slide_num] = image_path
-                            logger.info(f"Downloaded template image for slide {slide_num}: {search_query}")
+                    if image_path:
+                        slide_images[slide_num] = image_path
+                        logger.info(f"Downloaded template image for slide {slide_num}: {search_query}")
 
                     # Small delay to respect rate limits
                     await asyncio.sleep(0.3)
@@ -536,20 +528,12 @@ class DocumentService:
                     search_query = self._extract_search_keywords(slide_title, slide_content, topic)
                     
                     if search_query:
-                        # Search for images
-                        photos = await self.pexels.search_images(search_query, per_page=1)
-                        
-                        if photos:
-                            photo = photos[0]
-                            image_url = self.pexels.get_image_url(photo, "medium")
-                            
-                            # Download image
-                            filename = f"slide_{slide_num}.jpg"
-                            image_path = await self.pexels.download_image(image_url, filename)
-                            
-                            if image_path:
-                                images_dict[slide_num] = image_path
-                                logger.info(f"Added smart image for slide {slide_num}: {search_query}")
+                        # Search and download, reusing cached images for repeated queries
+                        image_path = await self.pexels.get_cached_image(search_query, f"slide_{slide_num}.jpg")
+
+                        if image_path:
+                            images_dict[slide_num] = image_path
+                            logger.info(f"Added smart image for slide {slide_num}: {search_query}")
                         
                         # Small delay to respect rate limits
                         await asyncio.sleep(0.2)
@@ -591,8 +575,7 @@ class DocumentService:
                     await self._create_content_slide_by_layout(prs, slide_data, layout_type, slide_num, images)
             
             # Save presentation
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"presentation_{timestamp}.pptx"
+            filename = unique_filename("presentation", ".pptx")
             file_path = os.path.join(self.documents_dir, filename)
             
             prs.save(file_path)
@@ -716,8 +699,7 @@ class DocumentService:
                         content_frame.paragraphs[0].alignment = PP_ALIGN.LEFT
 
             # Save presentation
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"presentation_{timestamp}.pptx"
+            filename = unique_filename("presentation", ".pptx")
             file_path = os.path.join(self.documents_dir, filename)
 
             prs.save(file_path)
@@ -731,176 +713,30 @@ class DocumentService:
 
     async def create_independent_work(self, topic: str, content: Dict) -> str:
         """Create independent work document"""
-        try:
-            doc = Document()
-
-            # Set document style
-            style = doc.styles['Normal']
-            font = style.font
-            font.name = 'Times New Roman'
-            font.size = Pt(12)
-
-            # Create custom title page with template design (language-specific)
-            user_lang = content.get('language', 'uzbek')  # Default to uzbek
-            await self._create_independent_work_title_page(doc, topic, user_lang)
-
-            # Add page break
-            doc.add_page_break()
-
-            # Table of contents
-            toc_para = doc.add_paragraph()
-            toc_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            toc_run = toc_para.add_run("REJA")
-            toc_run.font.size = Pt(14)
-            toc_run.font.bold = True
-
-            doc.add_paragraph()  # Empty line
-
-            # Add sections to TOC
-            sections = content.get('sections', [])
-            for idx, section in enumerate(sections, 1):
-                toc_item = doc.add_paragraph()
-                toc_item.paragraph_format.first_line_indent = Inches(0.5)
-                toc_item.add_run(f"{idx}. {section['title']}")
-
-            # Add page break
-            doc.add_page_break()
-
-            # Add sections content
-            for idx, section in enumerate(sections, 1):
-                # Section title
-                section_title = doc.add_paragraph()
-                section_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                section_title_run = section_title.add_run(f"{idx}. {section['title']}")
-                section_title_run.font.bold = True
-                section_title_run.font.size = Pt(14)
-
-                doc.add_paragraph()  # Empty line
-
-                # Section content
-                content_para = doc.add_paragraph(section['content'])
-                content_para.paragraph_format.first_line_indent = Inches(0.5)
-                content_para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY  # Justify alignment
-
-                doc.add_paragraph()  # Empty line
-
-            # References
-            if content.get('references'):
-                doc.add_page_break()
-
-                ref_title = doc.add_paragraph()
-                ref_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                ref_title_run = ref_title.add_run("FOYDALANILGAN ADABIYOTLAR")
-                ref_title_run.font.bold = True
-                ref_title_run.font.size = Pt(14)
-
-                doc.add_paragraph()  # Empty line
-
-                for idx, ref in enumerate(content['references'], 1):
-                    ref_para = doc.add_paragraph()
-                    ref_para.paragraph_format.first_line_indent = Inches(0.5)
-                    ref_para.add_run(f"{idx}. {ref}")
-
-            # Save document
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"independent_work_{timestamp}.docx"
-            file_path = os.path.join(self.documents_dir, filename)
-
-            doc.save(file_path)
-            logger.info(f"Independent work saved: {file_path}")
-
-            return file_path
-
-        except Exception as e:
-            logger.error(f"Error creating independent work: {e}")
-            raise
+        return await self._create_sectioned_document("independent_work", topic, content)
 
     async def create_referat(self, topic: str, content: Dict) -> str:
         """Create referat document"""
-        try:
-            doc = Document()
-
-            # Set document style
-            style = doc.styles['Normal']
-            font = style.font
-            font.name = 'Times New Roman'
-            font.size = Pt(12)
-
-            # Create custom title page with template design (language-specific)
-            user_lang = content.get('language', 'uzbek')  # Default to uzbek
-            await self._create_referat_title_page(doc, topic, user_lang)
-
-            # Add page break
-            doc.add_page_break()
-
-            # Table of contents
-            toc_para = doc.add_paragraph()
-            toc_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            toc_run = toc_para.add_run("REJA")
-            toc_run.font.size = Pt(14)
-            toc_run.font.bold = True
+        return await self._create_sectioned_document("referat", topic, content)
 
-            doc.add_paragraph()  # Empty line
-
-            # Add sections to TOC
+    async def _create_sectioned_document(self, document_type: str, topic: str, content: Dict) -> str:
+        """Build an independent work or referat from complete content"""
+        try:
             sections = content.get('sections', [])
-            for idx, section in enumerate(sections, 1):
-                toc_item = doc.add_paragraph()
-                toc_item.paragraph_format.first_line_indent = Inches(0.5)
-                toc_item.add_run(f"{idx}. {section['title']}")
-
-            # Add page break
-            doc.add_page_break()
-
-            # Add sections content
-            for idx, section in enumerate(sections, 1):
-                # Section title
-                section_title = doc.add_paragraph()
-                section_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                section_title_run = section_title.add_run(f"{idx}. {section['title']}")
-                section_title_run.font.bold = True
-                section_title_run.font.size = Pt(14)
-
-                doc.add_paragraph()  # Empty line
-
-                # Section content
-                content_para = doc.add_paragraph(section['content'])
-                content_para.paragraph_format.first_line_indent = Inches(0.5)
-                content_para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY  # Justify alignment
-
-                doc.add_paragraph()  # Empty line
-
-            # References
-            if content.get('references'):
-                doc.add_page_break()
-
-                ref_title = doc.add_paragraph()
-                ref_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                ref_title_run = ref_title.add_run("FOYDALANILGAN ADABIYOTLAR")
-                ref_title_run.font.bold = True
-                ref_title_run.font.size = Pt(14)
-
-                doc.add_paragraph()  # Empty line
-
-                for idx, ref in enumerate(content['references'], 1):
-                    ref_para = doc.add_paragraph()
-                    ref_para.paragraph_format.first_line_indent = Inches(0.5)
-                    ref_para.add_run(f"{idx}. {ref}")
-
-            # Save document
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"referat_{timestamp}.docx"
-            file_path = os.path.join(self.documents_dir, filename)
-
-            doc.save(file_path)
-            logger.info(f"Referat saved: {file_path}")
-
-            return file_path
+            builder = SectionedDocumentBuilder(self, document_type, topic, content.get('language', 'uzbek'))
+            await builder.start([section['title'] for section in sections])
+            for idx, section in enumerate(sections):
+                await builder.add_section(idx, section['content'])
+            return await builder.finish(content.get('references'))
 
         except Exception as e:
-            logger.error(f"Error creating referat: {e}")
+            logger.error(f"Error creating {document_type}: {e}")
             raise
 
+    def start_sectioned_document(self, document_type: str, topic: str, language: str) -> "SectionedDocumentBuilder":
+        """Get a builder that writes sections into the document as they are generated"""
+        return SectionedDocumentBuilder(self, document_type, topic, language)
+
     async def _create_referat_title_page(self, doc, topic: str, language: str = 'uzbek'):
         """Create referat title page with exact template design from user's image, language-specific"""
         try:
@@ -1211,22 +1047,7 @@ class DocumentService:
 
     async def _download_image(self, image_url: str, filename: str) -> Optional[str]:
         """Download image from URL for presentation"""
-        try:
-            file_path = os.path.join(self.temp_dir, filename)
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status == 200:
-                        with open(file_path, 'wb') as f:
-                            f.write(await response.read())
-                        return file_path
-                    else:
-                        logger.error(f"Failed to download image: HTTP {response.status}")
-                        return None
-
-        except Exception as e:
-            logger.error(f"Error downloading image: {e}")
-            return None
+        return await download_to_file(image_url, workspace_path(filename))
 
     async def _get_smart_images_for_presentation(self, topic: str, content: Dict) -> Dict[int, str]:
         """Get smart images for presentation slides using Pexels API"""
@@ -1254,20 +1075,12 @@ class DocumentService:
                 search_query = self._extract_search_keywords(slide_title, slide_content, topic)
 
                 if search_query:
-                    # Search for images
-                    photos = await self.pexels.search_images(search_query, per_page=1)
-
-                    if photos:
-                        photo = photos[0]
-                        image_url = self.pexels.get_image_url(photo, "medium")
+                    # Search and download, reusing cached images for repeated queries
+                    image_path = await self.pexels.get_cached_image(search_query, f"slide_{slide_num}.jpg")
 
-                        # Download image
-                        filename = f"slide_{slide_num}.jpg"
-                        image_path = await self.pexels.download_image(image_url, filename)
-
-                        if image_path:
-                            images_dict[slide_num] = image_path
-                            logger.info(f"Added smart image for slide {slide_num}: {search_query}")
+                    if image_path:
+                        images_dict[slide_num] = image_path
+                        logger.info(f"Added smart image for slide {slide_num}: {search_query}")
 
                     # Small delay to respect rate limits
                     await asyncio.sleep(0.2)
@@ -1276,4 +1089,137 @@ class DocumentService:
 
         except Exception as e:
             logger.error(f"Error getting smart images: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+
+class SectionedDocumentBuilder:
+    """Incremental .docx builder for independent work and referat.
+
+    Sections may arrive in any order; each is written as soon as all sections
+    before it are resolved, so the document grows while the rest are still being
+    generated. Failed sections are left out, and the plan (TOC) is filled in by
+    finish() with the sections that made it into the document.
+    """
+
+    def __init__(self, service: DocumentService, document_type: str, topic: str, language: str):
+        self.service = service
+        self.document_type = document_type
+        self.topic = topic
+        self.language = language
+        self.doc = None
+        self.section_titles: List[str] = []
+        self.written_titles: List[str] = []
+        self.failed: List[int] = []
+        self._pending: Dict[int, Optional[str]] = {}
+        self._next_index = 0
+        self._toc_anchor = None
+        self._lock = asyncio.Lock()
+
+    async def start(self, section_titles: List[str]):
+        """Write the title page and plan heading once the outline is known"""
+        self.section_titles = list(section_titles)
+        self.doc = Document()
+
+        # Set document style
+        font = self.doc.styles['Normal'].font
+        font.name = 'Times New Roman'
+        font.size = Pt(12)
+
+        # Create custom title page with template design (language-specific)
+        if self.document_type == "independent_work":
+            await self.service._create_independent_work_title_page(self.doc, self.topic, self.language)
+        else:
+            await self.service._create_referat_title_page(self.doc, self.topic, self.language)
+
+        self.doc.add_page_break()
+
+        # Table of contents heading; items are inserted before the anchor in finish()
+        toc_para = self.doc.add_paragraph()
+        toc_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        toc_run = toc_para.add_run("REJA")
+        toc_run.font.size = Pt(14)
+        toc_run.font.bold = True
+
+        self.doc.add_paragraph()  # Empty line
+        self._toc_anchor = self.doc.add_page_break()
+
+    async def add_section(self, index: int, text: Optional[str]):
+        """Add section text by outline index (None marks the section as failed)"""
+        async with self._lock:
+            self._pending[index] = text
+            while self._next_index in self._pending:
+                section_text = self._pending.pop(self._next_index)
+                if section_text is None:
+                    self.failed.append(self._next_index)
+                else:
+                    self._write_section(self.section_titles[self._next_index], section_text)
+                self._next_index += 1
+
+    def _write_section(self, title: str, text: str):
+        self.written_titles.append(title)
+
+        # Section title
+        section_title = self.doc.add_paragraph()
+        section_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        section_title_run = section_title.add_run(f"{len(self.written_titles)}. {title}")
+        section_title_run.font.bold = True
+        section_title_run.font.size = Pt(14)
+
+        self.doc.add_paragraph()  # Empty line
+
+        # Section content
+        content_para = self.doc.add_paragraph(text)
+        content_para.paragraph_format.first_line_indent = Inches(0.5)
+        content_para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY  # Justify alignment
+
+        self.doc.add_paragraph()  # Empty line
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.failed)
+
+    async def finish(self, references: Optional[List[str]] = None) -> str:
+        """Fill in the plan, add references and save; returns the file path"""
+        async with self._lock:
+            # Sections that never arrived count as failed
+            for index in range(self._next_index, len(self.section_titles)):
+                text = self._pending.pop(index, None)
+                if text is None:
+                    self.failed.append(index)
+                else:
+                    self._write_section(self.section_titles[index], text)
+            self._next_index = len(self.section_titles)
+
+            if not self.written_titles:
+                raise ValueError(f"No sections were generated for {self.document_type}")
+
+            for idx, title in enumerate(self.written_titles, 1):
+                toc_item = self._toc_anchor.insert_paragraph_before()
+                toc_item.paragraph_format.first_line_indent = Inches(0.5)
+                toc_item.add_run(f"{idx}. {title}")
+
+            # References
+            if references:
+                self.doc.add_page_break()
+
+                ref_title = self.doc.add_paragraph()
+                ref_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                ref_title_run = ref_title.add_run("FOYDALANILGAN ADABIYOTLAR")
+                ref_title_run.font.bold = True
+                ref_title_run.font.size = Pt(14)
+
+                self.doc.add_paragraph()  # Empty line
+
+                for idx, ref in enumerate(references, 1):
+                    ref_para = self.doc.add_paragraph()
+                    ref_para.paragraph_format.first_line_indent = Inches(0.5)
+                    ref_para.add_run(f"{idx}. {ref}")
+
+            # Save document; serialization is the slow part, keep it off the event loop
+            filename = unique_filename(self.document_type, ".docx")
+            file_path = os.path.join(self.service.documents_dir, filename)
+            await asyncio.to_thread(self.doc.save, file_path)
+            logger.info(f"{self.document_type} saved: {file_path}"
+                        + (f" (missing sections: {[i + 1 for i in self.failed]})" if self.failed else ""))
+            self.doc = None
+            return file_path
@@ -1,6 +1,5 @@
 import os
 import logging
-from datetime import datetime
 from pptx import Presentation
 from pptx.util import Inches as PptxInches, Pt as PptxPt
 from pptx.enum.text import PP_ALIGN
@@ -9,58 +8,86 @@ from pptx.dml.color import RGBColor
 from docx import Document
 from docx.shared import Inches as DocxInches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import asyncio
 from bot.services.pexels import PexelsService
 from services.ai_service_new import AIService
+from services.generation_cache import generation_cache
+from services.image_cache import get_variant_path
+from services.progress import report_progress
+from utils.helpers import unique_filename
+from config import IMAGE_CONCURRENCY, IMAGE_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
 class DocumentService:
-    def __init__(self, documents_dir: str = "generated_documents"):
+    def __init__(self, documents_dir: str = "generated_documents", ai_service: Optional[AIService] = None):
         self.documents_dir = documents_dir
-        self.ai_service = AIService()
+        self.ai_service = ai_service or AIService()
         
         # Ensure directories exist
         os.makedirs(self.documents_dir, exist_ok=True)
         os.makedirs("temp", exist_ok=True)
 
-    async def create_presentation_with_template_background(self, topic: str, content: Dict, author_name: str, template_id: str, template_service) -> str:
+    async def generate_presentation_content_and_images(self, topic: str, slide_count: int, language: str, fresh: bool = False) -> Tuple[Dict, Dict[int, str]]:
+        """Generate slide text and DALL-E images as one pipeline.
+
+        Image generation for a batch's text_with_image slides starts as soon as that
+        batch's text arrives, so total time is roughly max(text, images). Unless fresh
+        is set, cached slide text for this topic is reused, and a near-duplicate
+        topic's slide titles are used as the outline.
+        """
+        slide_titles = None
+        if not fresh:
+            cached = await self.ai_service.get_cached_presentation(topic, slide_count, language)
+            if cached:
+                images = await self._generate_dalle_images_for_slides(topic, cached['slides'])
+                return cached, images
+            slide_titles = await self.ai_service.get_similar_slide_titles(topic, slide_count, language)
+
+        semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+        batches = {}
+        image_tasks = []
+
+        async for batch_index, slides in self.ai_service.iter_presentation_batches(topic, slide_count, language, slide_titles):
+            batches[batch_index] = slides
+            for slide_data in slides:
+                if slide_data.get('layout_type', '') == "text_with_image":
+                    image_tasks.append(self._start_image_task(semaphore, slide_data, image_tasks))
+
+        results = await asyncio.gather(*image_tasks)
+        images = {slide_num: image_path for slide_num, image_path in results if image_path}
+
+        slides = [slide for batch_index in sorted(batches) for slide in batches[batch_index]]
+        logger.info(f"Generated {len(slides)} slides and {len(images)}/{len(image_tasks)} images for '{topic}'")
+        content = {"slides": slides}
+        if len(slides) < slide_count:
+            # Batches that failed after retries leave slides out; such decks are not cached
+            content['partial'] = True
+        else:
+            await generation_cache.set(topic, language, "presentation", slide_count, content)
+        return content, images
+
+    async def create_presentation_with_template_background(self, topic: str, content: Dict, author_name: str, template_id: str, template_service, images: Optional[Dict[int, str]] = None) -> str:
         """Create presentation with template background applied"""
         try:
-            # First create normal presentation
-            temp_file = await self.create_new_presentation_system(topic, content, author_name)
-            
-            # Now apply template backgrounds to all slides
-            from pptx import Presentation
-            prs = Presentation(temp_file)
-            
-            logger.info(f"Applying template {template_id} to {len(prs.slides)} slides")
-            
-            # Apply template background to each slide
-            for slide in prs.slides:
-                template_service.apply_template_to_slide(slide, template_id)
-                logger.info(f"Applied template background to slide")
+            # Backgrounds are applied while slides are created, so the deck is saved only once
+            prs = await self._build_presentation(topic, content, author_name, images, template_id, template_service)
             
             # Save with template name
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             template_name = template_service.templates.get(template_id, {}).get('name', 'standart')
-            filename = f"template_{template_name}_{timestamp}.pptx"
+            filename = unique_filename(f"template_{template_name}", ".pptx")
             file_path = os.path.join(self.documents_dir, filename)
             
             prs.save(file_path)
             
-            # Remove temporary file
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-            
             logger.info(f"Template presentation saved: {file_path}")
             return file_path
             
         except Exception as e:
             logger.error(f"Error creating template presentation: {e}")
             # Fallback to regular presentation
-            return await self.create_new_presentation_system(topic, content, author_name)
+            return await self.create_new_presentation_system(topic, content, author_name, images)
 
     async def _apply_template_background(self, slide, template_id: str, template_service):
         """Apply template background image to slide"""
@@ -214,7 +241,7 @@ class DocumentService:
             if image_path and os.path.exists(image_path):
                 try:
                     slide.shapes.add_picture(
-                        image_path,
+                        get_variant_path(image_path, "wide"),
                         PptxInches(5), PptxInches(2),      # Right side position
                         PptxInches(8), PptxInches(4.5)     # 70% width coverage
                     )
@@ -274,40 +301,13 @@ class DocumentService:
             p.font.color.rgb = colors.get('text', RGBColor(51, 51, 51))
             p.alignment = PP_ALIGN.LEFT
 
-    async def create_new_presentation_system(self, topic: str, content: Dict, author_name: str) -> str:
+    async def create_new_presentation_system(self, topic: str, content: Dict, author_name: str, images: Optional[Dict[int, str]] = None) -> str:
         """Create presentation with new 3-template rotating system and DALL-E images"""
         try:
-            # Validate content
-            if not content or 'slides' not in content:
-                logger.error(f"Invalid content structure: {content}")
-                raise ValueError("Content must contain 'slides' key")
-            
-            prs = Presentation()
-            
-            # Set slide size (16:9)
-            prs.slide_width = PptxInches(13.33)
-            prs.slide_height = PptxInches(7.5)
-            
-            slides_data = content.get('slides', [])
-            logger.info(f"Creating presentation with {len(slides_data)} slides")
-            
-            # Generate DALL-E images for text+image slides
-            images = await self._generate_dalle_images_for_slides(topic, slides_data)
-            
-            for idx, slide_data in enumerate(slides_data):
-                slide_num = slide_data.get('slide_number', idx + 1)
-                layout_type = slide_data.get('layout_type', 'bullet_points')
-                
-                logger.info(f"Creating slide {slide_num} with layout: {layout_type}")
-                
-                if slide_num == 1 or layout_type == "title":
-                    await self._create_title_slide(prs, topic, author_name)
-                else:
-                    await self._create_new_content_slide(prs, slide_data, layout_type, slide_num, images)
+            prs = await self._build_presentation(topic, content, author_name, images)
             
             # Save presentation
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"new_presentation_{timestamp}.pptx"
+            filename = unique_filename("new_presentation", ".pptx")
             file_path = os.path.join(self.documents_dir, filename)
             
             prs.save(file_path)
@@ -319,52 +319,92 @@ class DocumentService:
             logger.error(f"Error creating new presentation: {e}")
             raise
 
-    async def _generate_dalle_images_for_slides(self, topic: str, slides_data: List[Dict]) -> Dict[int, str]:
-        """Generate DALL-E images for text+image layout slides - NO TIME LIMITS"""
-        images_dict = {}
+    async def _build_presentation(self, topic: str, content: Dict, author_name: str, images: Optional[Dict[int, str]] = None, template_id: Optional[str] = None, template_service=None) -> Presentation:
+        """Build all slides in memory, applying the template background to each as it is created"""
+        # Validate content
+        if not content or 'slides' not in content:
+            logger.error(f"Invalid content structure: {content}")
+            raise ValueError("Content must contain 'slides' key")
         
-        try:
-            for slide_data in slides_data:
-                slide_num = slide_data.get('slide_number', 0)
-                layout_type = slide_data.get('layout_type', '')
-                
-                if layout_type == "text_with_image":
-                    slide_title = slide_data.get('title', '')
-                    slide_content = slide_data.get('content', '')
-                    
-                    try:
-                        # Generate DALL-E image - NO TIMEOUT
-                        logger.info(f"Starting DALL-E generation for slide {slide_num}: {slide_title}")
-                        image_url = await self.ai_service.generate_dalle_image(
-                            slide_content, slide_title
-                        )
-                        
-                        if image_url:
-                            # Download image - NO TIMEOUT
-                            filename = f"dalle_slide_{slide_num}.png"
-                            image_path = await self.ai_service.download_image(image_url, filename)
-                            
-                            if image_path:
-                                images_dict[slide_num] = image_path
-                                logger.info(f"✅ Successfully generated DALL-E image for slide {slide_num}: {slide_title}")
-                            else:
-                                logger.warning(f"Failed to download image for slide {slide_num}")
-                        else:
-                            logger.warning(f"No image URL received for slide {slide_num}")
-                    
-                    except Exception as e:
-                        logger.warning(f"Failed to generate image for slide {slide_num}: {e}")
-                        continue
-                    
-                    # Small delay between generations (keep for API rate limiting)
-                    await asyncio.sleep(0.5)
+        prs = Presentation()
+        
+        # Set slide size (16:9)
+        prs.slide_width = PptxInches(13.33)
+        prs.slide_height = PptxInches(7.5)
+        
+        slides_data = content.get('slides', [])
+        logger.info(f"Creating presentation with {len(slides_data)} slides")
+        
+        # Generate DALL-E images for text+image slides unless the pipeline already did
+        if images is None:
+            images = await self._generate_dalle_images_for_slides(topic, slides_data)
+        
+        for idx, slide_data in enumerate(slides_data):
+            slide_num = slide_data.get('slide_number', idx + 1)
+            layout_type = slide_data.get('layout_type', 'bullet_points')
             
-            logger.info(f"✅ DALL-E generation completed. Generated {len(images_dict)} images out of {len([s for s in slides_data if s.get('layout_type') == 'text_with_image'])} possible")
-            return images_dict
+            logger.info(f"Creating slide {slide_num} with layout: {layout_type}")
             
-        except Exception as e:
-            logger.error(f"Error generating DALL-E images: {e}")
-            return images_dict
+            if slide_num == 1 or layout_type == "title":
+                await self._create_title_slide(prs, topic, author_name)
+            else:
+                await self._create_new_content_slide(prs, slide_data, layout_type, slide_num, images)
+
+            # Background goes behind the shapes just added
+            if template_service is not None:
+                template_service.apply_template_to_slide(prs.slides[-1], template_id)
+
+        if template_service is not None:
+            logger.info(f"Applied template {template_id} to {len(prs.slides)} slides")
+
+        return prs
+
+    async def _generate_dalle_images_for_slides(self, topic: str, slides_data: List[Dict]) -> Dict[int, str]:
+        """Generate DALL-E images for text+image layout slides concurrently"""
+        image_slides = [s for s in slides_data if s.get('layout_type', '') == "text_with_image"]
+        semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+
+        image_tasks = []
+        for slide_data in image_slides:
+            image_tasks.append(self._start_image_task(semaphore, slide_data, image_tasks))
+        results = await asyncio.gather(*image_tasks)
+        images_dict = {slide_num: image_path for slide_num, image_path in results if image_path}
+
+        logger.info(f"✅ DALL-E generation completed. Generated {len(images_dict)} images out of {len(image_slides)} possible")
+        return images_dict
+
+    def _start_image_task(self, semaphore: asyncio.Semaphore, slide_data: Dict, image_tasks: List[asyncio.Task]) -> asyncio.Task:
+        """Start one slide image and report images done out of those started so far"""
+        task = asyncio.create_task(self._generate_slide_image(semaphore, slide_data))
+        task.add_done_callback(
+            lambda _: report_progress("images", sum(t.done() for t in image_tasks), len(image_tasks))
+        )
+        return task
+
+    async def _generate_slide_image(self, semaphore: asyncio.Semaphore, slide_data: Dict):
+        """Generate and download one slide image, giving up after IMAGE_TIMEOUT seconds"""
+        slide_num = slide_data.get('slide_number', 0)
+        slide_title = slide_data.get('title', '')
+        slide_content = slide_data.get('content', '')
+
+        async def generate_and_download() -> Optional[str]:
+            logger.info(f"Starting DALL-E generation for slide {slide_num}: {slide_title}")
+            image_path = await self.ai_service.get_slide_image(slide_content, slide_title, f"dalle_slide_{slide_num}.png")
+            if not image_path:
+                logger.warning(f"No image received for slide {slide_num}")
+            return image_path
+
+        async with semaphore:
+            try:
+                image_path = await asyncio.wait_for(generate_and_download(), timeout=IMAGE_TIMEOUT)
+                if image_path:
+                    logger.info(f"✅ Successfully generated DALL-E image for slide {slide_num}: {slide_title}")
+                return slide_num, image_path
+            except asyncio.TimeoutError:
+                logger.warning(f"DALL-E image for slide {slide_num} timed out after {IMAGE_TIMEOUT}s - using text-only layout")
+            except Exception as e:
+                logger.warning(f"Failed to generate image for slide {slide_num}: {e}")
+            return slide_num, None
 
     async def _create_new_content_slide(self, prs, slide_data: Dict, layout_type: str, slide_num: int, images: Dict):
         """Create content slide with new system layouts"""
@@ -446,9 +486,12 @@ class DocumentService:
         title_para.alignment = PP_ALIGN.CENTER
         
         # Left side: Continuous text (50% width) - FULL CONTENT
+        # Without an image (generation failed or timed out) the text takes the full width
+        image_path = images.get(slide_num)
+        has_image = bool(image_path) and os.path.exists(image_path)
         text_box = slide.shapes.add_textbox(
             PptxInches(0.5), PptxInches(2),
-            PptxInches(6), PptxInches(5)  # 50% width, more height
+            PptxInches(6) if has_image else PptxInches(12.3), PptxInches(5)  # 50% width, more height
         )
         text_frame = text_box.text_frame
         text_frame.word_wrap = True
@@ -474,21 +517,17 @@ class DocumentService:
         text_para.alignment = PP_ALIGN.LEFT  # Left alignment
 
         # Right side: DALL-E image (50% width - balanced layout)
-        if slide_num in images:
-            image_path = images[slide_num]
+        if has_image:
             logger.info(f"Adding DALL-E image for slide {slide_num}: {image_path}")
-            if image_path and os.path.exists(image_path):
-                try:
-                    slide.shapes.add_picture(
-                        image_path,
-                        PptxInches(6.8), PptxInches(2),    # Right side position
-                        PptxInches(6), PptxInches(5)   # 50% width, more height
-                    )
-                    logger.info(f"Successfully added DALL-E image to slide {slide_num}")
-                except Exception as e:
-                    logger.error(f"Error adding DALL-E image to slide {slide_num}: {e}")
-            else:
-                logger.warning(f"DALL-E image not found for slide {slide_num}: {image_path}")
+            try:
+                slide.shapes.add_picture(
+                    get_variant_path(image_path, "slide"),
+                    PptxInches(6.8), PptxInches(2),    # Right side position
+                    PptxInches(6), PptxInches(5)   # 50% width, more height
+                )
+                logger.info(f"Successfully added DALL-E image to slide {slide_num}")
+            except Exception as e:
+                logger.error(f"Error adding DALL-E image to slide {slide_num}: {e}")
         else:
             logger.info(f"No DALL-E image available for slide {slide_num}")
 
@@ -959,8 +998,7 @@ class DocumentService:
                     ref_para.add_run(f"{idx}. {ref}")
 
             # Save document
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"referat_{timestamp}.docx"
+            filename = unique_filename("referat", ".docx")
             file_path = os.path.join(self.documents_dir, filename)
             
             doc.save(file_path)
@@ -1062,8 +1100,7 @@ class DocumentService:
                     ref_para.add_run(f"{idx}. {ref}")
 
             # Save document
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"independent_work_{timestamp}.docx"
+            filename = unique_filename("independent_work", ".docx")
             file_path = os.path.join(self.documents_dir, filename)
             
             doc.save(file_path)
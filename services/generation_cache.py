@@ -0,0 +1,140 @@
+"""
+Generation Cache
+Reuses generated slide/section JSON for repeated (topic, language, type, size) requests
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Dict, Optional, Tuple
+from database.database import Database
+from services.topic_index import TopicIndex, covers_topic, normalize_topic
+from config import GENERATION_CACHE_TTL, GENERATION_CACHE_MAX_ENTRIES, TOPIC_SIMILARITY_THRESHOLD, TOPIC_INDEX_DIM
+
+logger = logging.getLogger(__name__)
+
+class GenerationCache:
+    """Persistent cache of AI outputs stored in the generation_cache table"""
+
+    def __init__(self, ttl: int = GENERATION_CACHE_TTL, max_entries: int = GENERATION_CACHE_MAX_ENTRIES,
+                 similarity_threshold: float = TOPIC_SIMILARITY_THRESHOLD):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+        # Built from the table on first similarity lookup
+        self._index: Optional[TopicIndex] = None
+        self._index_lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_key(topic: str, language: str, document_type: str, size: int) -> str:
+        """Content-addressed key for a generation request"""
+        raw = "|".join([normalize_topic(topic), language, document_type, str(size)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, topic: str, language: str, document_type: str, size: int) -> Optional[Dict]:
+        """Get cached content, or None on miss"""
+        if not self.enabled:
+            return None
+
+        try:
+            payload = await Database.get_cached_generation(
+                self.make_key(topic, language, document_type, size), self.ttl
+            )
+        except Exception as e:
+            logger.warning(f"Generation cache lookup failed: {e}")
+            payload = None
+
+        if payload is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        logger.info(f"Generation cache hit for {document_type} '{topic}' ({language}, {size})")
+        return json.loads(payload)
+
+    async def get_similar(self, topic: str, language: str, document_type: str, size: int) -> Optional[Tuple[Dict, str, float]]:
+        """Get (content, matched topic, similarity) of the closest cached near-duplicate topic.
+
+        A match needs both n-gram similarity above the threshold and every word of the
+        cached topic present in the requested one.
+        """
+        if not self.enabled or self.similarity_threshold <= 0:
+            return None
+
+        try:
+            index = await self._get_index()
+            matches = index.search(topic, document_type, language, size, k=5, threshold=self.similarity_threshold)
+            for cache_key, matched_topic, similarity in matches:
+                if not covers_topic(topic, matched_topic):
+                    continue
+                payload = await Database.get_cached_generation(cache_key, self.ttl)
+                if payload is None:
+                    # Expired or evicted since the index was built
+                    index.remove(cache_key)
+                    continue
+                self.similar_hits += 1
+                logger.info(f"Reusing {document_type} '{matched_topic}' for '{topic}' (similarity {similarity:.2f})")
+                return json.loads(payload), matched_topic, similarity
+        except Exception as e:
+            logger.warning(f"Similar topic lookup failed: {e}")
+        return None
+
+    async def _get_index(self) -> TopicIndex:
+        async with self._index_lock:
+            if self._index is None:
+                rows = await Database.get_cached_generation_topics(self.ttl)
+                # Vectorizing every cached topic is CPU work, keep it off the event loop
+                self._index = await asyncio.to_thread(self._build_index, rows)
+                logger.info(f"Topic index loaded with {len(self._index)} cached topics")
+            return self._index
+
+    @staticmethod
+    def _build_index(rows) -> TopicIndex:
+        index = TopicIndex(dim=TOPIC_INDEX_DIM, capacity=max(1024, len(rows)))
+        for cache_key, topic, document_type, language, size in rows:
+            index.add(cache_key, topic, document_type, language, size)
+        return index
+
+    async def set(self, topic: str, language: str, document_type: str, size: int, content: Dict):
+        """Store generated content and evict old entries"""
+        if not self.enabled:
+            return
+
+        cache_key = self.make_key(topic, language, document_type, size)
+        try:
+            await Database.store_cached_generation(
+                cache_key, document_type, language, json.dumps(content, ensure_ascii=False),
+                topic=topic, size=size
+            )
+            self.stores += 1
+            await Database.evict_cached_generations(self.max_entries, self.ttl)
+        except Exception as e:
+            logger.warning(f"Generation cache store failed: {e}")
+            return
+
+        if self._index is not None:
+            self._index.add(cache_key, topic, document_type, language, size)
+
+    def stats(self) -> dict:
+        """Get cache hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'indexed_topics': len(self._index) if self._index is not None else 0
+        }
+
+# Shared by every AI/document service instance
+generation_cache = GenerationCache()
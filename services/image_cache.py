@@ -0,0 +1,186 @@
+"""
+Image Cache
+Content-hashed on-disk cache of DALL-E and Pexels images with slide-sized variants
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+from PIL import Image, ImageOps
+from services.topic_index import normalize_topic
+from config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+# Pre-resized variants: 6"x5" text_with_image slot and 8"x4.5" template image slot
+IMAGE_VARIANTS = {
+    "slide": (1200, 1000),
+    "wide": (1280, 720),
+}
+
+def get_variant_path(image_path: str, variant: str) -> str:
+    """Get the pre-resized variant of a cached image, or the image itself"""
+    root, _ = os.path.splitext(image_path)
+    variant_path = f"{root}_{variant}.jpg"
+    return variant_path if os.path.exists(variant_path) else image_path
+
+class ImageCache:
+    """LRU image cache bounded by total bytes.
+
+    Lookup keys (normalized prompt or search query) map to content hashes, so the
+    same picture found by different queries is stored once. index.json is loaded
+    at startup and rewritten when images are added; recency updates from hits stay
+    in memory until the next write or flush() at shutdown.
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self._keys: Dict[str, str] = {}
+        self._files: Dict[str, Dict] = {}
+        self._lock = asyncio.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def make_key(source: str, text: str) -> str:
+        """Cache key for a DALL-E prompt or Pexels query"""
+        return hashlib.sha256(f"{source}|{normalize_topic(text)}".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._keys = data.get("keys", {})
+            self._files = {
+                content_hash: entry for content_hash, entry in data.get("files", {}).items()
+                if os.path.exists(os.path.join(self.directory, entry["file"]))
+            }
+            self._keys = {key: content_hash for key, content_hash in self._keys.items() if content_hash in self._files}
+            logger.info(f"Image cache loaded: {len(self._files)} images, {self.total_bytes // 1024} KB")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Image cache index unreadable, starting empty: {e}")
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"keys": self._keys, "files": self._files}, f)
+        os.replace(tmp_path, self.index_path)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._files.values())
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get path of the cached image for key, or None on miss"""
+        async with self._lock:
+            content_hash = self._keys.get(key)
+            entry = self._files.get(content_hash) if content_hash else None
+            path = os.path.join(self.directory, entry["file"]) if entry else None
+            if not path or not os.path.exists(path):
+                self.misses += 1
+                return None
+
+            entry["last_used"] = time.time()
+            self._dirty = True
+            self.hits += 1
+            return path
+
+    async def put_file(self, key: str, source_path: str) -> str:
+        """Move a downloaded image into the cache; returns its cached path"""
+        async with self._lock:
+            entry = await asyncio.to_thread(self._store, source_path)
+            self._keys[key] = entry["hash"]
+            await asyncio.to_thread(self._evict, entry["hash"])
+            await asyncio.to_thread(self._save)
+            self._dirty = False
+            return os.path.join(self.directory, entry["file"])
+
+    async def flush(self):
+        """Write recency updates from hits that have not been saved yet"""
+        async with self._lock:
+            if self._dirty:
+                await asyncio.to_thread(self._save)
+                self._dirty = False
+
+    def _store(self, source_path: str) -> Dict:
+        with open(source_path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+
+        entry = self._files.get(content_hash)
+        if entry:
+            # Same picture already cached under another prompt/query
+            os.remove(source_path)
+        else:
+            filename = f"{content_hash}{os.path.splitext(source_path)[1] or '.jpg'}"
+            path = os.path.join(self.directory, filename)
+            os.replace(source_path, path)
+            size = os.path.getsize(path) + self._make_variants(path)
+            entry = {"hash": content_hash, "file": filename, "size": size}
+            self._files[content_hash] = entry
+
+        entry["last_used"] = time.time()
+        return entry
+
+    def _make_variants(self, path: str) -> int:
+        """Write cropped/resized variants next to the image; returns their total size"""
+        size = 0
+        root, _ = os.path.splitext(path)
+        try:
+            with Image.open(path) as image:
+                image = image.convert("RGB")
+                for variant, dimensions in IMAGE_VARIANTS.items():
+                    variant_path = f"{root}_{variant}.jpg"
+                    ImageOps.fit(image, dimensions, Image.LANCZOS).save(variant_path, "JPEG", quality=85, optimize=True)
+                    size += os.path.getsize(variant_path)
+        except Exception as e:
+            logger.warning(f"Could not create variants for {path}: {e}")
+        return size
+
+    def _evict(self, keep_hash: str):
+        """Remove least recently used images (except keep_hash) until the cache fits max_bytes"""
+        total = self.total_bytes
+        if total <= self.max_bytes:
+            return
+
+        for content_hash, entry in sorted(self._files.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if content_hash == keep_hash:
+                continue
+            root, ext = os.path.splitext(os.path.join(self.directory, entry["file"]))
+            for path in [root + ext] + [f"{root}_{variant}.jpg" for variant in IMAGE_VARIANTS]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= entry["size"]
+            del self._files[content_hash]
+
+        self._keys = {key: content_hash for key, content_hash in self._keys.items() if content_hash in self._files}
+
+    def stats(self) -> dict:
+        """Get cache hit/miss counters and size"""
+        lookups = self.hits + self.misses
+        return {
+            'images': len(self._files),
+            'keys': len(self._keys),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+# Shared across users and services; index.json is loaded on import
+image_cache = ImageCache()
@@ -0,0 +1,120 @@
+"""
+Generation Job Queue
+Runs document generation from the document_orders table with a fixed pool of workers
+"""
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from database.database import Database
+from database.models import DocumentOrder
+from services.workspace import job_workspace
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when the queue cannot accept more orders"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason  # queue_busy or queue_user_limit
+
+class GenerationQueue:
+    """SQLite-backed generation queue.
+
+    Orders are stored with status queued -> generating -> completed/failed, so a
+    restart only needs to put generating orders back in the queue.
+    """
+
+    def __init__(self, runner: Callable[[DocumentOrder], Awaitable[None]], workers: int = 3,
+                 per_user_limit: int = 1, max_user_pending: int = 2, max_pending: int = 200,
+                 poll_interval: float = 5.0):
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.per_user_limit = max(1, per_user_limit)
+        self.max_user_pending = max_user_pending
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        # Claims are serialized so concurrent workers never race for the same write lock
+        self._claim_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Resume interrupted orders and start the workers"""
+        resumed = await Database.requeue_interrupted_orders()
+        if resumed:
+            logger.info(f"Resumed {resumed} interrupted generation jobs")
+
+        for number in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(number + 1)))
+        self._wakeup.set()
+        logger.info(f"Generation queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Stop the workers; orders still generating are resumed on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        logger.info("Generation queue stopped")
+
+    async def enqueue(self, user_id: int, document_type: str, topic: str, specifications: Dict) -> Tuple[int, int]:
+        """Queue an order; returns (order_id, queue position)"""
+        if self.max_user_pending and await Database.count_pending_orders(user_id) >= self.max_user_pending:
+            raise QueueFullError("queue_user_limit")
+        if self.max_pending and await Database.count_pending_orders() >= self.max_pending:
+            raise QueueFullError("queue_busy")
+
+        order_id = await Database.create_document_order(
+            user_id=user_id,
+            document_type=document_type,
+            topic=topic,
+            specifications=json.dumps(specifications),
+            status='queued'
+        )
+        position = await Database.get_queue_position(order_id)
+        self._wakeup.set()
+        logger.info(f"Queued {document_type} order {order_id} at position {position}")
+        return order_id, position
+
+    async def _claim(self) -> Optional[DocumentOrder]:
+        async with self._claim_lock:
+            return await Database.claim_next_document_order(self.per_user_limit)
+
+    async def _worker(self, number: int):
+        """Claim and run orders until cancelled"""
+        while True:
+            try:
+                order = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker {number} could not claim an order: {e}")
+                order = None
+
+            if order is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info(f"Worker {number} started order {order.id} ({order.document_type})")
+            try:
+                # Scratch files of the order live in temp/<order_id>/ and are removed afterwards
+                async with job_workspace(order.id):
+                    await self.runner(order)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker {number} failed order {order.id}: {e}")
+                try:
+                    await Database.update_document_order(order.id, "failed")
+                except Exception as db_error:
+                    logger.error(f"Could not mark order {order.id} as failed: {db_error}")
+
+            # Finishing an order may unblock another queued order of the same user
+            self._wakeup.set()
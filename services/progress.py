@@ -0,0 +1,107 @@
+"""
+Progress Reporting
+Throttled status message edits showing generation stages for a running job
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from translations import get_text
+from utils.helpers import get_progress_bar
+from config import PROGRESS_EDIT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Services report through the context, like the job workspace, so no reporter is threaded through calls
+_current_reporter: ContextVar[Optional["ProgressReporter"]] = ContextVar("progress_reporter", default=None)
+
+class ProgressReporter:
+    """Coalesces progress events into at most one status message edit per interval"""
+
+    def __init__(self, bot: Bot, chat_id: int, message_id: int, language: str,
+                 min_interval: float = PROGRESS_EDIT_INTERVAL):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.language = language
+        self.min_interval = min_interval
+        self._stages: Dict[str, Tuple[int, int]] = {}
+        self._last_text: Optional[str] = None
+        self._last_edit = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def report(self, stage: str, done: int = 0, total: int = 0):
+        """Record stage progress; the message is edited later with the latest state"""
+        self._stages[stage] = (done, total)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+
+    def render(self) -> str:
+        lines = [get_text(self.language, "generating"), ""]
+        for stage, (done, total) in self._stages.items():
+            label = get_text(self.language, f"progress_{stage}")
+            if total and done >= total:
+                lines.append(f"✅ {label}")
+            elif total:
+                lines.append(f"▫️ {label}: {done}/{total}\n{get_progress_bar(done, total, 10)}")
+            else:
+                lines.append(f"▫️ {label}")
+        return "\n".join(lines)
+
+    async def _flush(self):
+        # Events arriving while this waits are picked up by the single edit below
+        delay = self._last_edit + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        text = self.render()
+        if text == self._last_text:
+            return
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id)
+            self._last_text = text
+        except TelegramRetryAfter as e:
+            # Back off, then send whatever the state is by then
+            self._last_edit = time.monotonic() + e.retry_after
+            self._flush_task = asyncio.create_task(self._flush())
+            return
+        except TelegramBadRequest as e:
+            # "message is not modified" or the user deleted the message
+            logger.debug(f"Progress edit skipped: {e}")
+        except Exception as e:
+            logger.warning(f"Progress edit failed: {e}")
+        self._last_edit = time.monotonic()
+
+    async def close(self):
+        """Stop pending edits; the caller replaces the status with the result"""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+
+@asynccontextmanager
+async def job_progress(bot: Bot, chat_id: int, message_id: Optional[int], language: str):
+    """Make a reporter for the status message current for the duration of a job"""
+    if not message_id:
+        yield None
+        return
+    reporter = ProgressReporter(bot, chat_id, message_id, language)
+    token = _current_reporter.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _current_reporter.reset(token)
+        await reporter.close()
+
+def report_progress(stage: str, done: int = 0, total: int = 0):
+    """Report progress to the current job's status message, if there is one"""
+    reporter = _current_reporter.get()
+    if reporter is not None:
+        reporter.report(stage, done, total)
@@ -0,0 +1,189 @@
+"""
+OpenAI Rate Limiter
+Token buckets for requests/tokens per minute, retries with backoff and adaptive concurrency
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from config import (
+    OPENAI_CHAT_RPM, OPENAI_CHAT_TPM, OPENAI_IMAGE_RPM, OPENAI_CHAT_MAX_CONCURRENCY,
+    OPENAI_IMAGE_MAX_CONCURRENCY, OPENAI_MAX_ATTEMPTS
+)
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to one minute of budget (or capacity)"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.capacity = float(capacity or per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until amount can be taken (requests larger than the bucket wait for a full one)"""
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters in FIFO order so large requests are not starved
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) the difference between estimate and actual use"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit driven by throttling errors and latency inflation.
+
+    Successful calls grow the limit by about one per window; 429/5xx halve it and
+    latency well above the best recent latency shrinks it by 10%.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, latency_tolerance: float = 2.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, max_limit // 2))
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.best_latency: Optional[float] = None
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float] = None, throttled: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            elif latency is not None:
+                # Best latency slowly decays upwards so one lucky call does not pin it
+                if self.best_latency is None or latency < self.best_latency:
+                    self.best_latency = latency
+                else:
+                    self.best_latency *= 1.01
+                if latency > self.best_latency * self.latency_tolerance:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class RateLimitedLane:
+    """Request/token budgets, concurrency and retries for one kind of OpenAI call"""
+
+    def __init__(self, name: str, rpm: int, max_concurrency: int, tpm: Optional[int] = None,
+                 max_attempts: int = OPENAI_MAX_ATTEMPTS, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.calls = 0
+        self.throttled = 0
+        self.failures = 0
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code >= 500
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when present"""
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, estimated_tokens: int = 0, **kwargs) -> Any:
+        """Run an OpenAI call within the lane's budgets, retrying 429/5xx/connection errors"""
+        for attempt in range(self.max_attempts):
+            await self.requests.acquire()
+            if self.tokens and estimated_tokens:
+                await self.tokens.acquire(estimated_tokens)
+
+            await self.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                retryable = self._is_retryable(e)
+                await self.concurrency.release(throttled=retryable)
+                if not retryable or attempt + 1 >= self.max_attempts:
+                    self.failures += 1
+                    raise
+                self.throttled += 1
+                delay = self._backoff(attempt, e)
+                logger.warning(f"OpenAI {self.name} call throttled/failed ({e.__class__.__name__}), "
+                               f"retry {attempt + 1}/{self.max_attempts - 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            await self.concurrency.release(latency=time.monotonic() - started)
+            self.calls += 1
+            usage = getattr(result, "usage", None)
+            if self.tokens and usage is not None and getattr(usage, "total_tokens", None):
+                self.tokens.adjust(usage.total_tokens - estimated_tokens)
+            return result
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'throttled': self.throttled,
+            'failures': self.failures,
+            'concurrency_limit': round(self.concurrency.limit, 1),
+            'in_flight': self.concurrency.in_flight
+        }
+
+class OpenAILimiter:
+    """Central gate for every chat completion and image generation call"""
+
+    def __init__(self):
+        self.chat = RateLimitedLane("chat", OPENAI_CHAT_RPM, OPENAI_CHAT_MAX_CONCURRENCY, tpm=OPENAI_CHAT_TPM)
+        self.images = RateLimitedLane("images", OPENAI_IMAGE_RPM, OPENAI_IMAGE_MAX_CONCURRENCY)
+
+    @staticmethod
+    def estimate_tokens(messages, max_tokens: Optional[int] = None) -> int:
+        """Rough prompt size (4 characters per token) plus the expected completion"""
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+        return prompt_chars // 4 + (max_tokens or 1500)
+
+    async def chat_completion(self, client, **kwargs):
+        """client.chat.completions.create through the chat lane"""
+        estimated = self.estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        return await self.chat.call(client.chat.completions.create, estimated_tokens=estimated, **kwargs)
+
+    async def image_generation(self, client, **kwargs):
+        """client.images.generate through the images lane"""
+        return await self.images.call(client.images.generate, **kwargs)
+
+    def stats(self) -> dict:
+        return {'chat': self.chat.stats(), 'images': self.images.stats()}
+
+# Shared by every AI service in the process
+openai_limiter = OpenAILimiter()
@@ -0,0 +1,68 @@
+"""
+Render Service for Document Files
+Runs python-pptx/python-docx building and saving off the event loop
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+from config import RENDER_EXECUTOR, RENDER_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+
+def get_render_executor() -> Executor:
+    """Get the shared rendering executor, creating it on first use"""
+    global _executor
+    if _executor is None:
+        if RENDER_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+        logger.info(f"Render executor started: {RENDER_EXECUTOR} pool with {RENDER_WORKERS} workers")
+    return _executor
+
+def shutdown_render_executor():
+    """Stop the rendering executor"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+def _render(kind: str, kwargs: Dict) -> str:
+    """Build and save a document inside a worker; returns the file path"""
+    # Imported here so process-pool workers load the renderers themselves
+    if kind in ("presentation", "template_presentation"):
+        from services.document_service_new import DocumentService
+        from services.template_service import TemplateService
+
+        service = DocumentService()
+        # Images are produced by the async pipeline; never call the API from a worker
+        kwargs.setdefault("images", {})
+        if kind == "template_presentation":
+            kwargs["template_service"] = TemplateService()
+            return asyncio.run(service.create_presentation_with_template_background(**kwargs))
+        return asyncio.run(service.create_new_presentation_system(**kwargs))
+
+    if kind in ("independent_work", "referat"):
+        from services.document_service import DocumentService as OldDocumentService
+
+        service = OldDocumentService()
+        if kind == "independent_work":
+            return asyncio.run(service.create_independent_work(**kwargs))
+        return asyncio.run(service.create_referat(**kwargs))
+
+    raise ValueError(f"Unknown document kind: {kind}")
+
+async def render_document(kind: str, **kwargs) -> str:
+    """Render a document from plain content data in the rendering executor.
+
+    kind is one of presentation, template_presentation, independent_work or referat;
+    kwargs are the matching DocumentService method arguments (template_id instead of
+    a TemplateService instance).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_render_executor(), partial(_render, kind, kwargs))
@@ -0,0 +1,73 @@
+"""
+Single-Flight Requests
+Shares one in-flight generation between identical requests and drops accidental duplicates
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from config import ORDER_DEDUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """At most one call per key runs at a time; callers arriving meanwhile await its result"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Tuple[Any, bool]:
+        """Run func for key, or join the call already running; returns (result, shared)"""
+        future = self._calls.get(key)
+        if future is not None:
+            # Shielded so a cancelled follower does not cancel the leader's call
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        # Retrieve the exception even when nobody joined, to keep asyncio from warning
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
+
+    def running(self, key: Hashable) -> bool:
+        """True when a call for key is running, i.e. do(key, ...) would join it"""
+        return key in self._calls
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+class DuplicateFilter:
+    """Remembers keys for a short time so repeated taps on the same button are ignored"""
+
+    def __init__(self, ttl: float = ORDER_DEDUP_SECONDS):
+        self.ttl = ttl
+        self._seen: Dict[Hashable, float] = {}
+
+    def claim(self, key: Hashable) -> bool:
+        """True the first time key is seen within ttl seconds"""
+        now = time.monotonic()
+        if len(self._seen) > 1000:
+            self._seen = {k: expires for k, expires in self._seen.items() if expires > now}
+        if self._seen.get(key, 0) > now:
+            return False
+        self._seen[key] = now + self.ttl
+        return True
+
+# Identical generations (type, topic, language, size) share one run across users
+generation_flights = SingleFlight()
+
+# Order requests keyed by (user, message, button) are accepted once
+order_requests = DuplicateFilter()
@@ -0,0 +1,88 @@
+"""
+Statistics Service
+Short-lived snapshots of admin statistics and the background daily rollup job
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from database.database import Database
+from config import STATS_CACHE_TTL, STATS_ROLLUP_INTERVAL, STATS_ROLLUP_LOOKBACK_DAYS
+
+logger = logging.getLogger(__name__)
+
+class StatsService:
+    """Caches get_user_stats/get_daily_series results for ttl seconds.
+
+    Concurrent requests for an expired snapshot wait for one recomputation instead
+    of each running the aggregate queries.
+    """
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._snapshots: Dict[Tuple, Tuple[float, object]] = {}
+        self._lock = asyncio.Lock()
+
+    async def _cached(self, key: Tuple, compute):
+        snapshot = self._snapshots.get(key)
+        if snapshot and snapshot[0] > time.monotonic():
+            return snapshot[1]
+
+        async with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and snapshot[0] > time.monotonic():
+                return snapshot[1]
+            value = await compute()
+            self._snapshots[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    async def get_stats(self) -> Dict:
+        """Get the totals snapshot (users, orders, payments, revenue)"""
+        return await self._cached(("totals",), Database.get_user_stats)
+
+    async def get_daily_series(self, days: int = 7) -> List[Dict]:
+        """Get per-day users, orders and revenue for the last days"""
+        return await self._cached(("daily", days), lambda: Database.get_daily_series(days))
+
+    async def get_orders_by_type(self, day: str) -> Dict[str, int]:
+        """Get orders per document type on a day (YYYY-MM-DD)"""
+        return await self._cached(("orders_by_type", day), lambda: Database.get_daily_orders_by_type(day))
+
+    def invalidate(self):
+        """Drop all snapshots"""
+        self._snapshots.clear()
+
+# Shared by the admin handlers
+stats_service = StatsService()
+
+class DailyRollupJob:
+    """Keeps daily_stats current in the background; the first run back-fills history"""
+
+    def __init__(self, interval: float = STATS_ROLLUP_INTERVAL, lookback_days: int = STATS_ROLLUP_LOOKBACK_DAYS):
+        self.interval = interval
+        self.lookback_days = lookback_days
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                start_day = await Database.rollup_daily_stats(self.lookback_days)
+                if start_day:
+                    logger.info(f"Daily stats rolled up from {start_day}")
+                    stats_service.invalidate()
+            except Exception as e:
+                logger.error(f"Daily stats rollup failed: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,135 @@
+"""
+Topic Similarity Index
+Finds near-duplicate topics among cached generations with hashed character n-grams
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+def normalize_topic(topic: str) -> str:
+    """Normalize topic so case, spacing and punctuation variants compare equal"""
+    text = unicodedata.normalize("NFKC", topic).casefold()
+    # Uzbek apostrophe variants (o', o‘, oʻ, o`) all mean the same letter
+    text = re.sub(r"[‘’ʻʼ`´]", "'", text)
+    text = re.sub(r"[^\w\s']", " ", text)
+    return " ".join(text.split())
+
+def covers_topic(topic: str, candidate: str) -> bool:
+    """True when every word of candidate also appears in topic.
+
+    N-gram similarity alone scores topics differing in one word ("birinchi" vs
+    "ikkinchi") as near-duplicates; requiring the candidate's words keeps reuse to
+    topics that extend it, e.g. "sun'iy intellekt va uning ahamiyati" over
+    "sun'iy intellekt".
+    """
+    words = set(normalize_topic(topic).split())
+    candidate_words = set(normalize_topic(candidate).split())
+    return bool(candidate_words) and candidate_words <= words
+
+class TopicIndex:
+    """In-memory TF-IDF index of hashed character n-grams.
+
+    Every topic is a row of n-gram counts in one float32 matrix, so a lookup is a
+    single matrix-vector product plus argpartition regardless of the row count.
+    Rows are grouped by (document_type, language, size) and only rows of the
+    query's group are considered.
+    """
+
+    def __init__(self, dim: int = 512, ngram: int = 3, capacity: int = 1024):
+        self.dim = dim
+        self.ngram = ngram
+        self._counts = np.zeros((capacity, dim), dtype=np.float32)
+        self._groups = np.full(capacity, -1, dtype=np.int32)
+        self._doc_freq = np.zeros(dim, dtype=np.float32)
+        self._row_norms: Optional[np.ndarray] = None
+        self._group_ids: Dict[Tuple, int] = {}
+        self._rows: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._topics: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _vectorize(self, topic: str) -> np.ndarray:
+        """Count hashed character n-grams of each word (padded with spaces)"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in normalize_topic(topic).split():
+            padded = f" {word} "
+            for i in range(max(1, len(padded) - self.ngram + 1)):
+                gram = padded[i:i + self.ngram].encode("utf-8")
+                bucket = int.from_bytes(hashlib.blake2b(gram, digest_size=4).digest(), "little") % self.dim
+                vector[bucket] += 1.0
+        return vector
+
+    def _group(self, document_type: str, language: str, size: int) -> int:
+        return self._group_ids.setdefault((document_type, language, size), len(self._group_ids))
+
+    def _idf(self) -> np.ndarray:
+        rows = max(len(self._rows), 1)
+        return np.log((1.0 + rows) / (1.0 + self._doc_freq)).astype(np.float32) + 1.0
+
+    def add(self, key: str, topic: str, document_type: str, language: str, size: int):
+        """Add a topic, replacing an existing row with the same key"""
+        if key in self._rows:
+            self.remove(key)
+
+        row = len(self._keys)
+        if row >= len(self._counts):
+            grow = len(self._counts)
+            self._counts = np.vstack([self._counts, np.zeros((grow, self.dim), dtype=np.float32)])
+            self._groups = np.concatenate([self._groups, np.full(grow, -1, dtype=np.int32)])
+
+        vector = self._vectorize(topic)
+        self._counts[row] = vector
+        self._groups[row] = self._group(document_type, language, size)
+        self._doc_freq += vector > 0
+        self._rows[key] = row
+        self._keys.append(key)
+        self._topics.append(topic)
+        self._row_norms = None
+
+    def remove(self, key: str):
+        """Drop a topic; its row is left empty and never matches again"""
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        self._doc_freq -= self._counts[row] > 0
+        self._counts[row] = 0.0
+        self._groups[row] = -1
+        self._row_norms = None
+
+    def search(self, topic: str, document_type: str, language: str, size: int,
+               k: int = 5, threshold: float = 0.0) -> List[Tuple[str, str, float]]:
+        """Get up to k (key, topic, cosine similarity) matches at or above threshold"""
+        group = self._group_ids.get((document_type, language, size))
+        used = len(self._keys)
+        if group is None or not used:
+            return []
+
+        idf = self._idf()
+        query = self._vectorize(topic) * idf
+        query_norm = float(np.linalg.norm(query))
+        if query_norm == 0.0:
+            return []
+
+        counts = self._counts[:used]
+        # Row norms depend on idf, so they are recomputed only after the index changes
+        if self._row_norms is None:
+            self._row_norms = np.sqrt((counts * counts) @ (idf * idf))
+        norms = self._row_norms * query_norm
+
+        scores = counts @ (query * idf)
+        scores = np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
+        scores[self._groups[:used] != group] = -1.0
+
+        k = min(k, used)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self._keys[row], self._topics[row], float(scores[row]))
+            for row in top
+            if scores[row] >= threshold and scores[row] > 0
+        ]
@@ -0,0 +1,43 @@
+"""
+Job Workspace
+Per-job scratch directories for downloaded images and other intermediate files
+"""
+
+import logging
+import os
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+from config import TEMP_DIR
+
+logger = logging.getLogger(__name__)
+
+# Tasks and threads started inside a job inherit its workspace through the context
+_current_workspace: ContextVar[Optional[str]] = ContextVar("job_workspace", default=None)
+
+@asynccontextmanager
+async def job_workspace(job_id):
+    """Create temp/<job_id>/ for the duration of a job and remove it afterwards"""
+    path = os.path.join(TEMP_DIR, str(job_id))
+    os.makedirs(path, exist_ok=True)
+    token = _current_workspace.set(path)
+    try:
+        yield path
+    finally:
+        _current_workspace.reset(token)
+        shutil.rmtree(path, ignore_errors=True)
+        logger.debug(f"Removed job workspace {path}")
+
+def workspace_path(filename: str) -> str:
+    """Get a scratch path for filename inside the current job's workspace.
+
+    Outside a job the name is prefixed with a random id, so concurrent callers
+    never share a file.
+    """
+    workspace = _current_workspace.get()
+    if workspace:
+        return os.path.join(workspace, filename)
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    return os.path.join(TEMP_DIR, f"{uuid.uuid4().hex[:8]}_{filename}")
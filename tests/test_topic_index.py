@@ -0,0 +1,35 @@
+from services.topic_index import TopicIndex, covers_topic
+
+def make_index(*topics):
+    index = TopicIndex()
+    for i, topic in enumerate(topics):
+        index.add(str(i), topic, "presentation", "uz", 10)
+    return index
+
+def matches(index, topic, threshold=0.5):
+    return [
+        matched for _, matched, _ in index.search(topic, "presentation", "uz", 10, threshold=threshold)
+        if covers_topic(topic, matched)
+    ]
+
+def test_extended_topic_matches():
+    index = make_index("Sun'iy intellekt", "O'zbekiston tarixi")
+    assert matches(index, "sun'iy intellekt va uning ahamiyati") == ["Sun'iy intellekt"]
+    assert matches(index, "Sun’iy  intellekt va uning ahamiyati") == ["Sun'iy intellekt"]
+
+def test_different_war_does_not_match():
+    index = make_index("Ikkinchi jahon urushi sabablari")
+    assert matches(index, "Birinchi jahon urushi sabablari") == []
+
+def test_different_process_does_not_match():
+    index = make_index("Fotosintez jarayoni")
+    assert matches(index, "Xemosintez jarayoni") == []
+
+def test_narrower_topic_does_not_reuse_broader_one():
+    index = make_index("Sun'iy intellekt va uning ahamiyati")
+    assert matches(index, "Sun'iy intellekt") == []
+
+def test_search_is_limited_to_group():
+    index = make_index("Sun'iy intellekt")
+    assert index.search("Sun'iy intellekt", "referat", "uz", 10) == []
+    assert index.search("Sun'iy intellekt", "presentation", "ru", 10) == []
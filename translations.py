@@ -33,7 +33,19 @@ TRANSLATIONS = {
         "settings_menu": "⚙️ Sozlamalar\n\nTilni o'zgartirish:",
         "language_changed": "✅ Til o'zgartirildi!",
         "help_message": "📞 Yordam va ma'lumotlar",
-        "document_ready_caption": "🎯 {topic}\n📊 {slide_count} slayd\n🎨 {template} shablon"
+        "document_ready_caption": "🎯 {topic}\n📊 {slide_count} slayd\n🎨 {template} shablon",
+        "queued": "📥 Buyurtmangiz navbatga qo'yildi. Navbatdagi o'rningiz: {position}",
+        "queue_busy": "⏳ Hozir navbat juda band. Iltimos, birozdan so'ng qayta urinib ko'ring.",
+        "queue_user_limit": "⏳ Sizda hali tayyor bo'lmagan buyurtma bor. U tayyor bo'lgach, yangisini yuboring.",
+        "regenerate_fresh": "🔄 Yangidan yaratish",
+        "presentation_partial": "⚠️ Ba'zi slaydlarni yaratib bo'lmadi, taqdimot ularsiz tayyorlandi va buning uchun to'lov olinmadi. Qayta yaratishingiz mumkin.",
+        "document_partial": "⚠️ Ba'zi bo'limlarni yaratib bo'lmadi, hujjat ularsiz tayyorlandi va buning uchun to'lov olinmadi. Qayta yaratishingiz mumkin.",
+        "progress_shared": "Xuddi shunday so'rov bajarilmoqda, natijasi kutilmoqda",
+        "progress_outline": "Reja tuzilmoqda",
+        "progress_sections": "Bo'limlar yozilmoqda",
+        "progress_slides": "Slaydlar matni",
+        "progress_images": "Rasmlar",
+        "progress_rendering": "Fayl tayyorlanmoqda"
     },
     "ru": {
         "welcome": "🎓 Добро пожаловать в EduBot.ai!\n\nВыберите язык для создания академических документов:",
@@ -69,7 +81,19 @@ TRANSLATIONS = {
         "settings_menu": "⚙️ Настройки\n\nИзменить язык:",
         "language_changed": "✅ Язык изменен!",
         "help_message": "📞 Помощь",
-        "document_ready_caption": "🎯 {topic}\n📊 {slide_count} слайдов\n🎨 {template} шаблон"
+        "document_ready_caption": "🎯 {topic}\n📊 {slide_count} слайдов\n🎨 {template} шаблон",
+        "queued": "📥 Заказ поставлен в очередь. Ваше место в очереди: {position}",
+        "queue_busy": "⏳ Очередь сейчас переполнена. Пожалуйста, попробуйте немного позже.",
+        "queue_user_limit": "⏳ У вас уже есть незавершенный заказ. Отправьте новый, когда он будет готов.",
+        "regenerate_fresh": "🔄 Создать заново",
+        "presentation_partial": "⚠️ Некоторые слайды не удалось создать, презентация подготовлена без них, оплата за неё не списана. Вы можете создать её заново.",
+        "document_partial": "⚠️ Некоторые разделы не удалось создать, документ подготовлен без них, оплата за него не списана. Вы можете создать его заново.",
+        "progress_shared": "Такой же запрос уже выполняется, ожидаем его результат",
+        "progress_outline": "Составление плана",
+        "progress_sections": "Написание разделов",
+        "progress_slides": "Текст слайдов",
+        "progress_images": "Изображения",
+        "progress_rendering": "Подготовка файла"
     },
     "en": {
         "welcome": "🎓 Welcome to EduBot.ai!\n\nSelect language for creating academic documents:",
@@ -105,7 +129,19 @@ TRANSLATIONS = {
         "settings_menu": "⚙️ Settings\n\nChange language:",
         "language_changed": "✅ Language changed!",
         "help_message": "📞 Help and Information",
-        "document_ready_caption": "🎯 {topic}\n📊 {slide_count} slides\n🎨 {template} template"
+        "document_ready_caption": "🎯 {topic}\n📊 {slide_count} slides\n🎨 {template} template",
+        "queued": "📥 Your order is queued. Your position in the queue: {position}",
+        "queue_busy": "⏳ The queue is very busy right now. Please try again a little later.",
+        "queue_user_limit": "⏳ You already have an unfinished order. Send a new one when it is ready.",
+        "regenerate_fresh": "🔄 Regenerate from scratch",
+        "presentation_partial": "⚠️ Some slides could not be generated, so the presentation was prepared without them and you were not charged. You can regenerate it.",
+        "document_partial": "⚠️ Some sections could not be generated, so the document was prepared without them and you were not charged. You can regenerate it.",
+        "progress_shared": "An identical request is in progress, waiting for its result",
+        "progress_outline": "Drafting the outline",
+        "progress_sections": "Writing sections",
+        "progress_slides": "Slide text",
+        "progress_images": "Images",
+        "progress_rendering": "Preparing the file"
     }
 }
 
@@ -1,9 +1,10 @@
 import logging
 import asyncio
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Type
 from datetime import datetime, timedelta
 import string
 import random
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -121,6 +122,19 @@ def calculate_broadcast_delay(total_users: int) -> float:
         return 0.05  # 50ms delay
     return 0.03  # 30ms delay
 
+async def retry_async(func, *args, attempts: int = 3, base_delay: float = 1.0,
+                      retry_on: Tuple[Type[BaseException], ...] = (Exception,), **kwargs):
+    """Await func(*args, **kwargs), retrying with exponential backoff on retry_on exceptions"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return await func(*args, **kwargs)
+        except retry_on as e:
+            if attempt >= attempts:
+                raise
+            delay = base_delay * 2 ** (attempt - 1)
+            logger.warning(f"{getattr(func, '__name__', 'call')} failed (attempt {attempt}/{attempts}): {e}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
 async def safe_send_message(bot, chat_id: int, text: str, **kwargs) -> bool:
     """Safely send message with error handling"""
     try:
@@ -186,3 +200,8 @@ def escape_markdown(text: str) -> str:
     for char in special_chars:
         text = text.replace(char, f'\\{char}')
     return text
+
+def unique_filename(prefix: str, extension: str) -> str:
+    """Build an output filename that stays unique across concurrent jobs"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}{extension}"